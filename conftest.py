@@ -0,0 +1,10 @@
+import pytest
+
+
+@pytest.fixture(scope='session', autouse=True)
+def temp_cache():
+    """Отдельный файл кэша на время прогона pytest."""
+    from core.testing import use_temp_cache
+    restore = use_temp_cache()
+    yield
+    restore()
@@ -0,0 +1,379 @@
+import math
+import os
+import pickle
+import random
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в файле SQLite в режиме WAL, общий для всех процессов узла.
+
+    Вытесняет давно не читанные записи (LRU), ``incr`` атомарен между
+    процессами благодаря ``BEGIN IMMEDIATE``. Переполнение проверяется
+    раз в CULL_EVERY записей процесса: COUNT(*) проходит весь индекс
+    под блокировкой записи, поэтому MAX_ENTRIES соблюдается примерно.
+    """
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+    # Время последнего чтения обновляется не чаще раза в секунду на ключ,
+    # чтобы горячие ключи не превращали каждое чтение в запись.
+    access_resolution = 1
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = os.path.abspath(location)
+        self._local = threading.local()
+        options = params.get('OPTIONS', {})
+        self._cull_every = int(options.get('CULL_EVERY', 100))
+        self._unculled = 0
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self._path)
+            os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self._path, timeout=30, isolation_level=None
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+                'expires REAL, accessed REAL NOT NULL)'
+            )
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS cache_accessed '
+                'ON cache (accessed)'
+            )
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    @contextmanager
+    def _write(self):
+        """Транзакция с блокировкой записи с самого начала."""
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    @staticmethod
+    def _alive(expires, now):
+        return expires is None or expires > now
+
+    def _dumps(self, value):
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def _make_key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _store(self, connection, key, value, timeout, now):
+        connection.execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires, accessed) '
+            'VALUES (?, ?, ?, ?)',
+            (key, self._dumps(value), self.get_backend_timeout(timeout), now)
+        )
+
+    def _cull(self, connection, now, written=1):
+        self._unculled += written
+        if self._unculled < self._cull_every:
+            return
+        self._unculled = 0
+        count, = connection.execute('SELECT COUNT(*) FROM cache').fetchone()
+        if count <= self._max_entries:
+            return
+        count -= connection.execute(
+            'DELETE FROM cache WHERE expires <= ?', (now,)
+        ).rowcount
+        if count <= self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            connection.execute('DELETE FROM cache')
+            return
+        connection.execute(
+            'DELETE FROM cache WHERE key IN ('
+            'SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+            (count // self._cull_frequency,)
+        )
+
+    def _touch_accessed(self, keys, now):
+        if not keys:
+            return
+        placeholders = ', '.join('?' * len(keys))
+        self._connection().execute(
+            f'UPDATE cache SET accessed = ? WHERE key IN ({placeholders}) '
+            f'AND accessed < ?',
+            (now, *keys, now - self.access_resolution)
+        )
+
+    def get(self, key, default=None, version=None):
+        key = self._make_key(key, version)
+        return self._get_many([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        made = {self._make_key(key, version): key for key in keys}
+        return {
+            made[key]: value
+            for key, value in self._get_many(list(made)).items()
+        }
+
+    def _get_many(self, keys):
+        if not keys:
+            return {}
+        now = time.time()
+        placeholders = ', '.join('?' * len(keys))
+        rows = self._connection().execute(
+            f'SELECT key, value, expires FROM cache '
+            f'WHERE key IN ({placeholders})',
+            keys
+        ).fetchall()
+        found = {
+            key: pickle.loads(value)
+            for key, value, expires in rows
+            if self._alive(expires, now)
+        }
+        self._touch_accessed(list(found), now)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._make_key(key, version)
+        now = time.time()
+        with self._write() as connection:
+            self._store(connection, key, value, timeout, now)
+            self._cull(connection, now)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        with self._write() as connection:
+            for key, value in data.items():
+                key = self._make_key(key, version)
+                self._store(connection, key, value, timeout, now)
+            self._cull(connection, now, len(data))
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._make_key(key, version)
+        now = time.time()
+        with self._write() as connection:
+            row = connection.execute(
+                'SELECT expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is not None and self._alive(row[0], now):
+                return False
+            self._store(connection, key, value, timeout, now)
+            self._cull(connection, now)
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._make_key(key, version)
+        now = time.time()
+        with self._write() as connection:
+            cursor = connection.execute(
+                'UPDATE cache SET expires = ?, accessed = ? WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (self.get_backend_timeout(timeout), now, key, now)
+            )
+        return bool(cursor.rowcount)
+
+    def incr(self, key, delta=1, version=None):
+        key = self._make_key(key, version)
+        now = time.time()
+        with self._write() as connection:
+            row = connection.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None or not self._alive(row[1], now):
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ?, accessed = ? WHERE key = ?',
+                (self._dumps(value), now, key)
+            )
+        return value
+
+    def has_key(self, key, version=None):
+        key = self._make_key(key, version)
+        row = self._connection().execute(
+            'SELECT expires FROM cache WHERE key = ?', (key,)
+        ).fetchone()
+        return row is not None and self._alive(row[0], time.time())
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._make_key(key, version) for key in keys]
+        if not keys:
+            return
+        placeholders = ', '.join('?' * len(keys))
+        self._connection().execute(
+            f'DELETE FROM cache WHERE key IN ({placeholders})', keys
+        )
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+
+Entry = namedtuple('Entry', ['value', 'expires', 'delta'])
+
+
+class StampedeCache(BaseCache):
+    """Обёртка над другим кэшем с защитой от одновременного пересчёта.
+
+    LOCATION — имя кэша из CACHES, в котором лежат данные. Значение
+    хранится вместе с логическим сроком жизни и временем вычисления:
+
+    * незадолго до истечения срока ``get`` и ``get_many`` с вероятностью,
+      растущей к концу срока, сообщают промах одному воркеру (probabilistic
+      early expiration, XFetch);
+    * после истечения срока промах получает только воркер, взявший
+      блокировку пересчёта, остальные ещё STALE_TIMEOUT секунд получают
+      устаревшее значение;
+    * если значения нет совсем, остальные воркеры до LOCK_WAIT секунд
+      ждут результата пересчёта.
+
+    Целые числа — счётчики: они хранятся как есть, и ``incr``/``decr``
+    атомарно выполняет сам нижележащий кэш.
+
+    Как CACHES['template_fragments'] обёртка подхватывается тегом
+    ``{% cache %}`` без изменений шаблонов.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._alias = location
+        self.beta = options.get('BETA', 1.0)
+        self.stale_timeout = options.get('STALE_TIMEOUT', 300)
+        self.lock_timeout = options.get('LOCK_TIMEOUT', 30)
+        self.lock_wait = options.get('LOCK_WAIT', 1)
+        self._local = threading.local()
+
+    @property
+    def _cache(self):
+        return caches[self._alias]
+
+    def _started(self):
+        if not hasattr(self._local, 'started'):
+            self._local.started = {}
+        return self._local.started
+
+    @staticmethod
+    def _lock_key(key):
+        return f'{key}:recompute'
+
+    def _claim(self, key, version):
+        """Берёт блокировку пересчёта ключа для текущего воркера."""
+        claimed = self._cache.add(
+            self._lock_key(key), True, self.lock_timeout, version=version
+        )
+        if claimed:
+            self._started()[(key, version)] = time.monotonic()
+        return claimed
+
+    def _wait(self, keys, version):
+        """Ждёт значения, которые пересчитывает другой воркер."""
+        deadline = time.monotonic() + self.lock_wait
+        entries = {}
+        while keys and time.monotonic() < deadline:
+            time.sleep(0.05)
+            found = self._cache.get_many(keys, version=version)
+            entries.update(found)
+            keys = [key for key in keys if key not in found]
+        return entries
+
+    def _expiring(self, entry):
+        if entry.expires is None:
+            return False
+        jitter = -entry.delta * self.beta * math.log(1.0 - random.random())
+        return time.time() + jitter >= entry.expires
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        entries = self._cache.get_many(keys, version=version)
+        waiting = [
+            key for key in keys
+            if key not in entries and not self._claim(key, version)
+        ]
+        if waiting:
+            entries.update(self._wait(waiting, version))
+        values = {}
+        for key, entry in entries.items():
+            if not isinstance(entry, Entry):
+                values[key] = entry
+            elif not self._expiring(entry) or not self._claim(key, version):
+                values[key] = entry.value
+        return values
+
+    def _entry(self, key, value, timeout, version):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        started = self._started().pop((key, version), None)
+        if type(value) is int:
+            return value, timeout
+        entry = Entry(
+            value=value,
+            expires=None if timeout is None else time.time() + timeout,
+            delta=0 if started is None else time.monotonic() - started,
+        )
+        if timeout is not None:
+            timeout += self.stale_timeout
+        return entry, timeout
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        entry, timeout = self._entry(key, value, timeout, version)
+        self._cache.set(key, entry, timeout, version=version)
+        self._cache.delete(self._lock_key(key), version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        for key, value in data.items():
+            self.set(key, value, timeout, version=version)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        entry, timeout = self._entry(key, value, timeout, version)
+        added = self._cache.add(key, entry, timeout, version=version)
+        if added:
+            self._cache.delete(self._lock_key(key), version=version)
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        return self._cache.incr(key, delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        return self._cache.decr(key, delta, version=version)
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        value = self.get(key, version=version)
+        if value is None:
+            value = default() if callable(default) else default
+            if value is not None:
+                self.set(key, value, timeout, version=version)
+        return value
+
+    def has_key(self, key, version=None):
+        return self._cache.has_key(key, version=version)
+
+    def delete(self, key, version=None):
+        self._cache.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        self._cache.delete_many(keys, version=version)
+
+    def clear(self):
+        self._cache.clear()
@@ -0,0 +1,75 @@
+import os
+import re
+import tempfile
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+# Подкаталог MEDIA_ROOT с уменьшенными копиями: веб-сервер может отдавать
+# его как обычную статику и обращаться к Django только при промахе.
+RESIZE_DIR = 'r'
+SAVE_FORMATS = {'JPEG', 'PNG', 'GIF', 'WEBP'}
+JPEG_QUALITY = 85
+# Имя ``<каталог>/ab/ab…<sha256>.<ext>`` из ContentAddressedStorage:
+# содержимое такого файла никогда не меняется.
+CONTENT_ADDRESSED = re.compile(
+    r'(?:[^/]+/)*([0-9a-f]{2})/\1[0-9a-f]{62}\.\w+'
+)
+
+
+def is_content_addressed(name):
+    return CONTENT_ADDRESSED.fullmatch(name) is not None
+
+
+def resized_path(width, height, name):
+    return os.path.join(
+        settings.MEDIA_ROOT, RESIZE_DIR, f'{width}x{height}', name
+    )
+
+
+def remove_resized(name):
+    """Удаляет уменьшенные копии картинки во всех размерах.
+
+    Перебираются каталоги на диске, а не RESIZE_SIZES: копии размеров,
+    убранных из настроек, тоже удаляются.
+    """
+    root = os.path.join(settings.MEDIA_ROOT, RESIZE_DIR)
+    try:
+        sizes = [entry.path for entry in os.scandir(root) if entry.is_dir()]
+    except FileNotFoundError:
+        return
+    for size in sizes:
+        try:
+            os.remove(os.path.join(size, name))
+        except FileNotFoundError:
+            pass
+
+
+def resize(source, target, size):
+    """Сохраняет в target копию source, обрезанную по центру до size.
+
+    Запись идёт во временный файл с атомарной заменой, так что
+    параллельные запросы той же копии не видят недописанный файл.
+    """
+    with Image.open(source) as image:
+        image_format = image.format
+        image.draft(image.mode, size)
+        image = ImageOps.exif_transpose(image)
+        image = ImageOps.fit(image, size, Image.LANCZOS)
+    params = {}
+    if image_format not in SAVE_FORMATS:
+        image_format = 'JPEG'
+    if image_format == 'JPEG':
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        params = {'quality': JPEG_QUALITY, 'optimize': True}
+    directory = os.path.dirname(target)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            image.save(temp_file, format=image_format, **params)
+        os.replace(temp_path, target)
+    except BaseException:
+        os.remove(temp_path)
+        raise
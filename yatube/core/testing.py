@@ -0,0 +1,39 @@
+import copy
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+def use_temp_cache():
+    """Переводит кэш по умолчанию во временный файл SQLite.
+
+    Тесты очищают кэш целиком и не должны трогать кэш работающего
+    сайта. Возвращает функцию, которая возвращает настройки и удаляет
+    временный файл.
+    """
+    directory = tempfile.mkdtemp(prefix='yatube-cache-')
+    caches = copy.deepcopy(settings.CACHES)
+    caches['default']['LOCATION'] = os.path.join(directory, 'cache.sqlite3')
+    override = override_settings(CACHES=caches)
+    override.enable()
+
+    def restore():
+        override.disable()
+        shutil.rmtree(directory, ignore_errors=True)
+    return restore
+
+
+class TestRunner(DiscoverRunner):
+    """Раннер ``manage.py test`` с отдельным кэшем на время прогона."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._restore_cache = use_temp_cache()
+
+    def teardown_test_environment(self, **kwargs):
+        self._restore_cache()
+        super().teardown_test_environment(**kwargs)
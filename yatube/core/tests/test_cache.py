@@ -0,0 +1,133 @@
+import os
+import shutil
+import tempfile
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from ..cache import SQLiteCache
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.location, {})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_shared_between_instances(self):
+        """Запись видна другому экземпляру с тем же файлом."""
+        other = SQLiteCache(self.location, {})
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(other.get('key'), {'value': 1})
+        other.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_incr_and_add(self):
+        """incr изменяет значение, add не перезаписывает ключ."""
+        with self.assertRaises(ValueError):
+            self.cache.incr('counter')
+        self.assertTrue(self.cache.add('counter', 1))
+        self.assertFalse(self.cache.add('counter', 10))
+        self.assertEqual(self.cache.incr('counter', 5), 6)
+        self.assertEqual(self.cache.get_many(['counter', 'missing']), {
+            'counter': 6
+        })
+
+    def test_cull_checked_periodically(self):
+        """Переполнение проверяется не на каждой записи."""
+        cache = SQLiteCache(self.location, {'OPTIONS': {
+            'MAX_ENTRIES': 1, 'CULL_FREQUENCY': 0, 'CULL_EVERY': 3,
+        }})
+        cache.set('first', 1)
+        cache.set('second', 2)
+        self.assertEqual(cache.get_many(['first', 'second']), {
+            'first': 1, 'second': 2
+        })
+        cache.set('third', 3)
+        self.assertEqual(cache.get_many(['first', 'second', 'third']), {})
+
+    def test_expired_entries_are_missing(self):
+        """Просроченные записи не возвращаются."""
+        self.cache.set('key', 'value', timeout=-1)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertFalse(self.cache.has_key('key'))
+
+    def test_lru_eviction(self):
+        """При переполнении вытесняются давно не читанные записи."""
+        cache = SQLiteCache(
+            self.location, {'OPTIONS': {
+                'MAX_ENTRIES': 2, 'CULL_FREQUENCY': 2, 'CULL_EVERY': 1,
+            }}
+        )
+        cache.access_resolution = 0
+        cache.set('old', 1)
+        cache.set('hot', 2)
+        cache.get('hot')
+        cache.set('new', 3)
+        self.assertIsNone(cache.get('old'))
+        self.assertEqual(cache.get_many(['hot', 'new']), {'hot': 2, 'new': 3})
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'stampede': {
+        'BACKEND': 'core.cache.StampedeCache',
+        'LOCATION': 'default',
+        'OPTIONS': {'LOCK_WAIT': 0},
+    },
+})
+class StampedeCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.cache = caches['stampede']
+        self.cache.clear()
+
+    def test_single_flight_on_miss(self):
+        """Промах получает только один воркер."""
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.has_key('key:recompute'))
+        self.cache.set('key', 'value', 60)
+        self.assertFalse(self.cache.has_key('key:recompute'))
+        self.assertEqual(self.cache.get('key'), 'value')
+
+    def test_stale_value_while_recomputing(self):
+        """Пока один воркер пересчитывает, остальные получают старое."""
+        self.cache.set('key', 'old', 0)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(self.cache.get('key'), 'old')
+        self.cache.set('key', 'new', 60)
+        self.assertEqual(self.cache.get('key'), 'new')
+
+    def test_get_or_set(self):
+        """get_or_set вычисляет значение только при промахе."""
+        self.assertEqual(self.cache.get_or_set('key', lambda: 1, 60), 1)
+        self.assertEqual(self.cache.get_or_set('key', lambda: 2, 60), 1)
+        self.assertEqual(self.cache.get_many(['key']), {'key': 1})
+
+    def test_get_many_single_flight(self):
+        """get_many отдаёт промах по каждому ключу только одному воркеру."""
+        self.cache.set('fresh', 'value', 60)
+        self.cache.set('stale', 'old', 0)
+        self.assertEqual(
+            self.cache.get_many(['fresh', 'stale', 'missing']),
+            {'fresh': 'value'}
+        )
+        self.assertEqual(
+            self.cache.get_many(['fresh', 'stale', 'missing']),
+            {'fresh': 'value', 'stale': 'old'}
+        )
+
+    def test_counters_delegated(self):
+        """add, incr и decr атомарно выполняет нижележащий кэш."""
+        self.assertTrue(self.cache.add('counter', 1))
+        self.assertFalse(self.cache.add('counter', 5))
+        self.assertEqual(self.cache.incr('counter', 2), 3)
+        self.assertEqual(self.cache.decr('counter'), 2)
+        self.assertEqual(self.cache.get('counter'), 2)
+        self.assertEqual(caches['default'].get('counter'), 2)
+        self.assertTrue(self.cache.add('entry', 'value', 60))
+        self.assertEqual(self.cache.get('entry'), 'value')
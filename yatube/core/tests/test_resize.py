@@ -0,0 +1,83 @@
+import os
+import shutil
+import tempfile
+from http import HTTPStatus
+
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+HASHED = 'ab' + '0' * 62
+HASHED_NAME = f'posts/{HASHED[:2]}/{HASHED}.png'
+
+
+class ResizedImageTest(SimpleTestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        override = override_settings(
+            MEDIA_ROOT=self.media_root, RESIZE_SIZES={(40, 20)}
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        os.makedirs(os.path.join(self.media_root, 'posts', HASHED[:2]))
+        self.source = os.path.join(self.media_root, 'posts', 'photo.png')
+        Image.new('RGB', (300, 100), 'red').save(self.source)
+        self.hashed = os.path.join(self.media_root, HASHED_NAME)
+        shutil.copy(self.source, self.hashed)
+
+    def tearDown(self):
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def url(self, width, height, name=HASHED_NAME):
+        return reverse('resized_image', args=(width, height, name))
+
+    def test_resized_once_and_cached(self):
+        """Копия создаётся один раз и отдаётся с долгим кэшированием."""
+        response = self.client.get(self.url(40, 20))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Content-Type'], 'image/png')
+        response.close()
+        cached = os.path.join(self.media_root, 'r', '40x20', HASHED_NAME)
+        with Image.open(cached) as image:
+            self.assertEqual(image.size, (40, 20))
+        os.remove(self.hashed)
+        response = self.client.get(self.url(40, 20))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        response.close()
+
+    def test_mutable_name_follows_source(self):
+        """Копия файла с обычным именем пересоздаётся после его замены."""
+        url = self.url(40, 20, 'posts/photo.png')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotIn('immutable', response['Cache-Control'])
+        response.close()
+        cached = os.path.join(
+            self.media_root, 'r', '40x20', 'posts', 'photo.png'
+        )
+        os.utime(cached, (0, 0))
+        Image.new('RGB', (300, 100), 'blue').save(self.source)
+        response = self.client.get(url)
+        response.close()
+        with Image.open(cached) as image:
+            self.assertEqual(image.getpixel((20, 10)), (0, 0, 255))
+        os.remove(self.source)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_rejected_requests(self):
+        """Размеры вне списка и пути вне MEDIA_ROOT не обслуживаются."""
+        self.client.get(self.url(40, 20)).close()
+        for url in (
+            self.url(41, 20),
+            self.url(40, 20, '../secret.png'),
+            self.url(40, 20, 'posts/../r/40x20/' + HASHED_NAME),
+            self.url(40, 20, './r/40x20/' + HASHED_NAME),
+            self.url(40, 20, 'posts/missing.png'),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_FOUND
+                )
@@ -1,4 +1,14 @@
+import os
+import posixpath
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404
 from django.shortcuts import render
+from django.utils._os import safe_join
+from PIL import Image
+
+from .resize import RESIZE_DIR, is_content_addressed, resize, resized_path
 
 
 def page_not_found(request, exception):
@@ -15,3 +25,50 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def _source_path(name):
+    """Путь к оригиналу картинки; имя приводится к нормальной форме."""
+    if '..' in name.split('/'):
+        raise Http404('Файл не найден')
+    name = posixpath.normpath(name)
+    if name.split('/', 1)[0] == RESIZE_DIR:
+        raise Http404('Файл не найден')
+    try:
+        return name, safe_join(settings.MEDIA_ROOT, name)
+    except SuspiciousFileOperation:
+        raise Http404('Файл не найден')
+
+
+def resized_image(request, width, height, name):
+    """Картинка из MEDIA_ROOT в одном из размеров RESIZE_SIZES.
+
+    Копия создаётся при первом запросе и дальше отдаётся с диска;
+    FileResponse передаёт файл через wsgi.file_wrapper (sendfile).
+    Копию картинки с именем по содержимому браузер может хранить вечно,
+    копия любой другой пересоздаётся, если оригинал новее неё.
+    """
+    if (width, height) not in settings.RESIZE_SIZES:
+        raise Http404('Размер не поддерживается')
+    name, source = _source_path(name)
+    target = resized_path(width, height, name)
+    immutable = is_content_addressed(name)
+    exists = os.path.isfile(target)
+    if not immutable or not exists:
+        if not os.path.isfile(source):
+            raise Http404('Файл не найден')
+        if not exists or os.path.getmtime(source) > os.path.getmtime(target):
+            try:
+                resize(source, target, (width, height))
+            except (OSError, Image.DecompressionBombError):
+                raise Http404('Файл не является картинкой')
+    response = FileResponse(open(target, 'rb'))
+    if immutable:
+        response['Cache-Control'] = (
+            f'public, max-age={settings.RESIZE_CACHE_MAX_AGE}, immutable'
+        )
+    else:
+        response['Cache-Control'] = (
+            f'public, max-age={settings.RESIZE_MUTABLE_MAX_AGE}'
+        )
+    return response
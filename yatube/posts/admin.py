@@ -1,6 +1,7 @@
 from django.contrib import admin
 
 from .models import Group, Post, Comment
+from .search import matching_ids, to_match
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -16,6 +17,14 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Вместо LIKE по search_fields — полнотекстовый индекс FTS5.
+        if to_match(search_term) is None:
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        return queryset.filter(pk__in=matching_ids(search_term)), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ("pk", "title", "slug", "description")
@@ -0,0 +1,176 @@
+import threading
+from bisect import bisect_left, insort
+
+from django.core.cache import cache
+from django.urls import reverse
+
+from . import generations
+from .models import Group, User
+
+SCOPE = 'autocomplete'
+LIMIT = 10
+# Сколько последних изменений хранится в общем кэше: процесс, отставший
+# сильнее или не нашедший запись, перестраивает индекс из базы.
+CHANGE_LOG_SIZE = 100
+CHANGE_LOG_TIMEOUT = 60 * 60 * 24
+
+
+def _change_key(generation):
+    return f'posts:autocomplete:change:{generation}'
+
+
+def _terms(*phrases):
+    """Ключи поиска: каждая фраза целиком и каждое её слово."""
+    terms = set()
+    for phrase in phrases:
+        phrase = ' '.join(phrase.lower().split())
+        if phrase:
+            terms.add(phrase)
+            terms.update(phrase.split())
+    return terms
+
+
+class AutocompleteIndex:
+    """Отсортированный индекс префиксов авторов и групп в памяти процесса.
+
+    Каждое изменение сдвигает поколение SCOPE и записывается в общий
+    кэш под новым номером: (вид, id, запись индекса или None). Процесс
+    при следующем запросе применяет пропущенные записи по порядку и
+    перестраивает индекс из базы, только если часть журнала потеряна.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = []
+        self._items = {}
+        self.generation = None
+
+    def _insert(self, kind, pk, item, insert=insort):
+        self._items[(kind, pk)] = item
+        for term in item['terms']:
+            insert(self._keys, (term, kind, pk))
+
+    def _remove(self, kind, pk):
+        item = self._items.pop((kind, pk), None)
+        if item is None:
+            return
+        for term in item['terms']:
+            position = bisect_left(self._keys, (term, kind, pk))
+            del self._keys[position]
+
+    @staticmethod
+    def _user_item(user):
+        full_name = user.get_full_name()
+        label = f'{user.username} ({full_name})' if full_name else (
+            user.username
+        )
+        return {
+            'type': 'user',
+            'label': label,
+            'url': reverse('posts:profile', args=(user.username,)),
+            'terms': _terms(user.username, full_name),
+        }
+
+    @staticmethod
+    def _group_item(group):
+        return {
+            'type': 'group',
+            'label': group.title,
+            'url': reverse('posts:group_list', args=(group.slug,)),
+            'terms': _terms(group.title, group.slug),
+        }
+
+    def rebuild(self, generation=None):
+        users = User.objects.only(
+            'pk', 'username', 'first_name', 'last_name'
+        )
+        groups = Group.objects.only('pk', 'title', 'slug')
+        with self._lock:
+            self._keys = []
+            self._items = {}
+            # Ключи добавляются в конец и сортируются один раз.
+            for user in users.iterator():
+                self._insert(
+                    'user', user.pk, self._user_item(user), list.append
+                )
+            for group in groups.iterator():
+                self._insert(
+                    'group', group.pk, self._group_item(group), list.append
+                )
+            self._keys.sort()
+            self.generation = generation
+
+    def _catch_up(self, current):
+        """Применяет журнал изменений до поколения current.
+
+        Вызывается под блокировкой; False — журнал не покрывает разрыв
+        и индекс нужно перестроить.
+        """
+        if self.generation == current:
+            return True
+        if self.generation is None or not (
+            0 < current - self.generation <= CHANGE_LOG_SIZE
+        ):
+            return False
+        keys = [
+            _change_key(generation)
+            for generation in range(self.generation + 1, current + 1)
+        ]
+        changes = cache.get_many(keys)
+        if len(changes) != len(keys):
+            return False
+        for key in keys:
+            kind, pk, item = changes[key]
+            self._remove(kind, pk)
+            if item is not None:
+                self._insert(kind, pk, item)
+        self.generation = current
+        return True
+
+    def _changed(self, kind, pk, obj=None):
+        item = None if obj is None else getattr(self, f'_{kind}_item')(obj)
+        with self._lock:
+            new = generations.bump(SCOPE)[SCOPE]
+            cache.set(_change_key(new), (kind, pk, item), CHANGE_LOG_TIMEOUT)
+            # Своё изменение применяется вместе с чужими, записанными
+            # между поколением индекса и новым.
+            if not self._catch_up(new):
+                self.generation = None
+
+    def user_changed(self, pk, user=None):
+        """Обновляет автора с этим id; без ``user`` — убирает его."""
+        self._changed('user', pk, user)
+
+    def group_changed(self, pk, group=None):
+        """Обновляет группу с этим id; без ``group`` — убирает её."""
+        self._changed('group', pk, group)
+
+    def complete(self, prefix, limit=LIMIT):
+        """Авторы и группы, у которых есть ключ с таким префиксом."""
+        prefix = ' '.join(prefix.lower().split())
+        if not prefix:
+            return []
+        current = generations.get(SCOPE)
+        with self._lock:
+            caught_up = self._catch_up(current)
+        if not caught_up:
+            self.rebuild(current)
+        results = []
+        seen = set()
+        with self._lock:
+            position = bisect_left(self._keys, (prefix,))
+            while position < len(self._keys) and len(results) < limit:
+                term, kind, pk = self._keys[position]
+                if not term.startswith(prefix):
+                    break
+                if (kind, pk) not in seen:
+                    seen.add((kind, pk))
+                    item = self._items[(kind, pk)]
+                    results.append({
+                        key: item[key] for key in ('type', 'label', 'url')
+                    })
+                position += 1
+        return results
+
+
+index = AutocompleteIndex()
@@ -0,0 +1,90 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from sorl.thumbnail import delete as delete_with_thumbnails
+from sorl.thumbnail.images import ImageFile
+
+from core.resize import remove_resized
+
+from .models import ImageBlob, Post
+
+# Файл без ссылок удаляется не раньше, чем через столько времени после
+# последнего использования: его могли только что переиспользовать для
+# поста, который ещё не сохранён.
+GRACE_PERIOD = timedelta(hours=1)
+
+
+def register(name):
+    """Заводит строку для только что записанного файла, пока без ссылок.
+
+    Файл, пост которого так и не сохранился (например, откатилась
+    транзакция), останется без ссылок и будет удалён collect() после
+    GRACE_PERIOD; до тех пор его защищает свежее время ``updated``.
+    """
+    ImageBlob.objects.bulk_create(
+        [ImageBlob(name=name)], ignore_conflicts=True
+    )
+    ImageBlob.objects.filter(name=name).update(updated=timezone.now())
+
+
+def acquire(name):
+    """Учитывает новую ссылку поста на файл."""
+    if not name:
+        return
+    with transaction.atomic():
+        ImageBlob.objects.bulk_create(
+            [ImageBlob(name=name)], ignore_conflicts=True
+        )
+        ImageBlob.objects.filter(name=name).update(
+            refs=F('refs') + 1, updated=timezone.now()
+        )
+
+
+def release(name):
+    """Снимает ссылку поста на файл; сам файл удалит collect()."""
+    if not name:
+        return
+    ImageBlob.objects.filter(name=name, refs__gt=0).update(
+        refs=F('refs') - 1, updated=timezone.now()
+    )
+
+
+def recount():
+    """Пересчитывает ссылки всех файлов по таблице постов."""
+    counts = {}
+    for name in Post.objects.exclude(image='').values_list(
+        'image', flat=True
+    ).iterator():
+        counts[name] = counts.get(name, 0) + 1
+    with transaction.atomic():
+        ImageBlob.objects.exclude(name__in=list(counts)).update(refs=0)
+        for name, refs in counts.items():
+            ImageBlob.objects.update_or_create(
+                name=name, defaults={'refs': refs}
+            )
+
+
+def collect(grace=GRACE_PERIOD):
+    """Удаляет файлы без ссылок вместе с миниатюрами и копиями /media/r/.
+
+    Возвращает число удалённых файлов.
+    """
+    storage = Post._meta.get_field('image').storage
+    deadline = timezone.now() - grace
+    removed = 0
+    names = ImageBlob.objects.filter(
+        refs=0, updated__lt=deadline
+    ).values_list('name', flat=True)
+    for name in list(names):
+        if storage.exists(name) and storage.get_modified_time(name) > deadline:
+            # Содержимое только что загрузили повторно.
+            continue
+        with transaction.atomic():
+            if not ImageBlob.objects.filter(name=name, refs=0).delete()[0]:
+                continue
+            delete_with_thumbnails(ImageFile(name, storage))
+            remove_resized(name)
+        removed += 1
+    return removed
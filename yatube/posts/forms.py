@@ -1,6 +1,10 @@
-from django.forms import ModelForm
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.forms import ModelForm, ValidationError
+from PIL import Image
 
 from .models import Post, Comment
+from .uploads import OversizedUpload, ingest
 
 
 class PostForm(ModelForm):
@@ -18,6 +22,32 @@ class PostForm(ModelForm):
             'image': 'Изображение'
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Содержимое отброшено ещё при приёме: проверять как картинку
+        # нечего, ошибку выдаёт clean_image.
+        self.oversized = isinstance(self.files.get('image'), OversizedUpload)
+        if self.oversized:
+            self.files = self.files.copy()
+            del self.files['image']
+
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        limit = settings.IMAGE_MAX_UPLOAD_SIZE
+        if self.oversized or (
+            isinstance(image, UploadedFile) and image.size > limit
+        ):
+            raise ValidationError(
+                f'Размер изображения не должен превышать '
+                f'{limit // (1024 * 1024)} МБ'
+            )
+        if not isinstance(image, UploadedFile):
+            return image
+        try:
+            return ingest(image)
+        except (OSError, Image.DecompressionBombError):
+            raise ValidationError('Не удалось обработать изображение')
+
 
 class CommentForm(ModelForm):
     class Meta:
@@ -0,0 +1,67 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+def _key(scope):
+    return f'posts:generation:{scope}'
+
+
+def _fresh():
+    # После вытеснения счётчика нельзя начинать с 1: старые фрагменты
+    # с такими номерами могли ещё остаться в кэше.
+    return int(time.time() * 1000)
+
+
+def get(scope):
+    """Номер поколения ленты для ключа фрагмента ``{% cache %}``."""
+    return get_many([scope])[scope]
+
+
+def get_many(scopes):
+    """Номера поколений нескольких областей одним запросом к кэшу."""
+    keys = {_key(scope): scope for scope in scopes}
+    generations = {
+        keys[key]: value for key, value in cache.get_many(keys).items()
+    }
+    for key, scope in keys.items():
+        if scope not in generations:
+            cache.add(key, _fresh(), timeout=None)
+            generations[scope] = cache.get(key)
+    return generations
+
+
+def bump(*scopes):
+    """Сдвигает поколения областей; возвращает их новые номера."""
+    generations = {}
+    for scope in scopes:
+        key = _key(scope)
+        try:
+            generations[scope] = cache.incr(key)
+        except ValueError:
+            generations[scope] = _fresh()
+            cache.set(key, generations[scope], timeout=None)
+    return generations
+
+
+def bump_on_commit(*scopes):
+    """Сдвигает поколения после фиксации текущей транзакции.
+
+    Сдвиг внутри транзакции виден другим запросам раньше самих данных:
+    они успели бы закэшировать старое состояние под новым номером.
+    Поэтому в транзакции поколения сдвигаются дважды: сразу — чтобы
+    чтения в ней самой не брали устаревший кэш, и после фиксации —
+    чтобы отбросить всё, что закэшировали под промежуточным номером.
+    """
+    if transaction.get_connection().in_atomic_block:
+        bump(*scopes)
+    transaction.on_commit(lambda: bump(*scopes))
+
+
+def bump_post(post_id, author_id, group_id=None):
+    """Сбрасывает ленты и страницы, в которых показывается пост."""
+    scopes = ['index', f'post:{post_id}', f'author:{author_id}']
+    if group_id is not None:
+        scopes.append(f'group:{group_id}')
+    bump_on_commit(*scopes)
@@ -0,0 +1,60 @@
+from hashlib import md5
+
+from django.core.cache import cache
+from django.http import Http404
+
+from .models import Group, User
+
+LOOKUP_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _key(kind, identifier):
+    # slug и имя пользователя могут содержать пробелы и символы не из
+    # ASCII, недопустимые в ключах memcached: в ключ попадает их хэш.
+    return f'posts:{kind}:{md5(identifier.encode()).hexdigest()}'
+
+
+def group_key(slug):
+    return _key('group', slug)
+
+
+def user_key(username):
+    return _key('user', username)
+
+
+def _lookup(request, key, queryset, **filters):
+    """Объект из памяти запроса, общего кэша или базы данных."""
+    memo = request.__dict__.setdefault('_lookups', {})
+    if key in memo:
+        return memo[key]
+    obj = cache.get(key)
+    if obj is None:
+        obj = queryset.filter(**filters).first()
+        if obj is not None:
+            cache.set(key, obj, LOOKUP_CACHE_TIMEOUT)
+    memo[key] = obj
+    return obj
+
+
+def find_group(request, slug):
+    return _lookup(request, group_key(slug), Group.objects, slug=slug)
+
+
+def find_user(request, username):
+    return _lookup(
+        request, user_key(username), User.objects, username=username
+    )
+
+
+def get_group_or_404(request, slug):
+    group = find_group(request, slug)
+    if group is None:
+        raise Http404('Группа не найдена')
+    return group
+
+
+def get_user_or_404(request, username):
+    user = find_user(request, username)
+    if user is None:
+        raise Http404('Пользователь не найден')
+    return user
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts import blobs
+
+
+class Command(BaseCommand):
+    help = 'Удаляет файлы картинок, на которые не ссылается ни один пост'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recount', action='store_true',
+            help='Сначала пересчитать ссылки по таблице постов'
+        )
+
+    def handle(self, *args, **options):
+        if options['recount']:
+            blobs.recount()
+        removed = blobs.collect()
+        self.stdout.write(
+            self.style.SUCCESS(f'Удалено файлов: {removed}')
+        )
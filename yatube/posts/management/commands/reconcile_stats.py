@@ -0,0 +1,19 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts.stats import recount
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов и подписок пользователей'
+
+    def handle(self, *args, **options):
+        total = 0
+        for user_id in User.objects.values_list('pk', flat=True).iterator():
+            recount(user_id)
+            total += 1
+        self.stdout.write(
+            self.style.SUCCESS(f'Пересчитана статистика: {total}')
+        )
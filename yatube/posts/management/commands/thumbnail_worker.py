@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.thumbnails import BATCH_SIZE, process_pending
+
+
+class Command(BaseCommand):
+    help = 'Создаёт миниатюры картинок новых и изменённых постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Разобрать очередь и завершиться'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=5,
+            help='Пауза между проверками пустой очереди, секунд'
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            done = process_pending(BATCH_SIZE)
+            total += done
+            if done:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Обработано постов: {total}')
+        )
@@ -0,0 +1,53 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:10
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_stats(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    UserStats = apps.get_model('posts', 'UserStats')
+    UserStats.objects.bulk_create(
+        (
+            UserStats(
+                user_id=user_id,
+                posts_count=Post.objects.filter(author_id=user_id).count(),
+                followers_count=Follow.objects.filter(
+                    author_id=user_id
+                ).count(),
+                following_count=Follow.objects.filter(
+                    user_id=user_id
+                ).count(),
+            )
+            for user_id in User.objects.values_list('pk', flat=True)
+        ),
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0012_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Всего постов')),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='Всего подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, verbose_name='Всего подписок')),
+            ],
+            options={
+                'verbose_name': 'Статистика пользователя',
+                'verbose_name_plural': 'Статистика пользователей',
+            },
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_post_updated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='thumbnails',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'В очереди'), (1, 'Готовы'), (2, 'Ошибка')], default=0, editable=False, verbose_name='Миниатюры'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(thumbnails=0), fields=['id'], name='post_thumbnails_pending_idx'),
+        ),
+    ]
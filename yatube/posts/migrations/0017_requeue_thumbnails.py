@@ -0,0 +1,20 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:40
+
+from django.db import migrations
+
+
+def requeue_thumbnails(apps, schema_editor):
+    # Уменьшенных и WebP-вариантов ещё нет: их создаст thumbnail_worker.
+    Post = apps.get_model('posts', 'Post')
+    Post.objects.filter(thumbnails=1).update(thumbnails=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_post_thumbnails'),
+    ]
+
+    operations = [
+        migrations.RunPython(requeue_thumbnails, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:50
+
+from django.db import migrations, models
+from django.db.models import Count
+import posts.storage
+
+
+def fill_blobs(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    ImageBlob = apps.get_model('posts', 'ImageBlob')
+    counts = Post.objects.exclude(image='').values('image').annotate(
+        refs=Count('pk')
+    ).order_by()
+    ImageBlob.objects.bulk_create(
+        ImageBlob(name=row['image'], refs=row['refs']) for row in counts
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_requeue_thumbnails'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Файл')),
+                ('refs', models.PositiveIntegerField(default=0, verbose_name='Число ссылок')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Дата изменения')),
+            ],
+            options={
+                'verbose_name': 'Файл картинки',
+                'verbose_name_plural': 'Файлы картинок',
+            },
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, storage=posts.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Картинка'),
+        ),
+        migrations.AddIndex(
+            model_name='imageblob',
+            index=models.Index(condition=models.Q(refs=0), fields=['updated'], name='imageblob_unused_idx'),
+        ),
+        migrations.RunPython(fill_blobs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:30
+
+from django.db import migrations, models
+
+
+def requeue_images(apps, schema_editor):
+    # Заглушки существующих картинок заполнит thumbnail_worker.
+    Post = apps.get_model('posts', 'Post')
+    Post.objects.exclude(image='').update(thumbnails=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_imageblob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='dominant_color',
+            field=models.CharField(blank=True, editable=False, max_length=7, verbose_name='Основной цвет картинки'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='placeholder',
+            field=models.TextField(blank=True, editable=False, verbose_name='Заглушка картинки'),
+        ),
+        migrations.RunPython(requeue_images, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:10
+
+from django.db import migrations
+
+# Внешнее содержимое: индекс хранит только токены, сам текст берётся
+# из posts_post по rowid = id. Триггеры ловят и QuerySet.update().
+# Если миграция когда-нибудь пересоздаст таблицу posts_post (так SQLite
+# выполняет часть изменений схемы), триггеры нужно создать заново.
+CREATE_SQL = [
+    "CREATE VIRTUAL TABLE posts_post_fts USING fts5("
+    "text, content='posts_post', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER posts_post_fts_insert AFTER INSERT ON posts_post BEGIN "
+    "INSERT INTO posts_post_fts (rowid, text) VALUES (new.id, new.text); "
+    "END",
+    "CREATE TRIGGER posts_post_fts_delete AFTER DELETE ON posts_post BEGIN "
+    "INSERT INTO posts_post_fts (posts_post_fts, rowid, text) "
+    "VALUES ('delete', old.id, old.text); "
+    "END",
+    "CREATE TRIGGER posts_post_fts_update AFTER UPDATE OF text ON posts_post "
+    "BEGIN "
+    "INSERT INTO posts_post_fts (posts_post_fts, rowid, text) "
+    "VALUES ('delete', old.id, old.text); "
+    "INSERT INTO posts_post_fts (rowid, text) VALUES (new.id, new.text); "
+    "END",
+    "INSERT INTO posts_post_fts (posts_post_fts) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER posts_post_fts_update",
+    "DROP TRIGGER posts_post_fts_delete",
+    "DROP TRIGGER posts_post_fts_insert",
+    "DROP TABLE posts_post_fts",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_post_placeholder'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_SQL, DROP_SQL),
+    ]
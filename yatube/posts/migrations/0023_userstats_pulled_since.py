@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0022_author_group_pub_date_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='pulled_since',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Читается при запросе с'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:01
+
+from django.db import migrations, models
+
+
+def mark_imageless(apps, schema_editor):
+    # Постам без картинки миниатюры не нужны: они не должны висеть в
+    # очереди thumbnail_worker.
+    Post = apps.get_model('posts', 'Post')
+    Post.objects.filter(image='', thumbnails=0).update(thumbnails=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0023_userstats_pulled_since'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='post',
+            name='post_thumbnails_pending_idx',
+        ),
+        migrations.RunPython(mark_imageless, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('thumbnails', 0), models.Q(_negated=True, image='')), fields=['id'], name='post_thumbnails_pending_idx'),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from .storage import ContentAddressedStorage
+
 
 User = get_user_model()
 
@@ -23,11 +25,24 @@ class Group(models.Model):
 
 
 class Post(models.Model):
+    THUMBNAILS_PENDING = 0
+    THUMBNAILS_READY = 1
+    THUMBNAILS_FAILED = 2
+    THUMBNAIL_STATES = (
+        (THUMBNAILS_PENDING, 'В очереди'),
+        (THUMBNAILS_READY, 'Готовы'),
+        (THUMBNAILS_FAILED, 'Ошибка'),
+    )
+
     text = models.TextField(verbose_name="Текст")
     pub_date = models.DateTimeField(
         auto_now_add=True,
         verbose_name="Дата публикации"
     )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Дата изменения"
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -45,17 +60,63 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Число комментариев"
+    )
+    thumbnails = models.PositiveSmallIntegerField(
+        choices=THUMBNAIL_STATES,
+        default=THUMBNAILS_PENDING,
+        editable=False,
+        verbose_name="Миниатюры"
+    )
+    placeholder = models.TextField(
+        blank=True,
+        editable=False,
+        verbose_name="Заглушка картинки"
+    )
+    dominant_color = models.CharField(
+        max_length=7,
+        blank=True,
+        editable=False,
+        verbose_name="Основной цвет картинки"
+    )
 
     class Meta:
         verbose_name = "Пост"
         verbose_name_plural = "Посты"
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx'
+            ),
+            models.Index(
+                fields=['id'],
+                name='post_thumbnails_pending_idx',
+                condition=models.Q(thumbnails=0) & ~models.Q(image='')
+            ),
+        ]
 
         def __str__(self):
             return self.text[:15]
 
+    @property
+    def thumbnails_ready(self):
+        return self.thumbnails == self.THUMBNAILS_READY
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -80,6 +141,14 @@ class Comment(models.Model):
         verbose_name="Время публикации"
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['post', 'created'],
+                name='comment_post_created_idx'
+            ),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -94,3 +163,99 @@ class Follow(models.Model):
         related_name='following',
         verbose_name="Автор"
     )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique_follow'
+            ),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name="Читатель"
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name="Пост"
+    )
+    pub_date = models.DateTimeField(verbose_name="Дата публикации")
+
+    class Meta:
+        verbose_name = "Запись ленты"
+        verbose_name_plural = "Записи ленты"
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_pub_date_idx'
+            ),
+        ]
+
+
+class UserStats(models.Model):
+    """Денормализованные счётчики пользователя для профиля."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name="Пользователь"
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Всего постов"
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Всего подписчиков"
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Всего подписок"
+    )
+    pulled_since = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Читается при запросе с"
+    )
+
+    class Meta:
+        verbose_name = "Статистика пользователя"
+        verbose_name_plural = "Статистика пользователей"
+
+
+class ImageBlob(models.Model):
+    """Файл картинки в хранилище и число постов, которые на него ссылаются."""
+    name = models.CharField(
+        max_length=100,
+        unique=True,
+        verbose_name="Файл"
+    )
+    refs = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Число ссылок"
+    )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Дата изменения"
+    )
+
+    class Meta:
+        verbose_name = "Файл картинки"
+        verbose_name_plural = "Файлы картинок"
+        indexes = [
+            models.Index(
+                fields=['updated'],
+                name='imageblob_unused_idx',
+                condition=models.Q(refs=0)
+            ),
+        ]
@@ -0,0 +1,104 @@
+from functools import wraps
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from . import generations, lookups
+from .models import Post
+
+
+def tag_page(request, *tags):
+    """Помечает страницу областями, от которых зависит её содержимое.
+
+    Номера поколений снимаются до чтения данных, поэтому запись,
+    случившаяся во время рендеринга, не спрячется за кэшем.
+    """
+    if hasattr(request, 'page_cache_tags'):
+        request.page_cache_tags.update(generations.get_many(tags))
+
+
+def _page_key(request):
+    path = md5(request.get_full_path().encode()).hexdigest()
+    return f'posts:page:{path}'
+
+
+def cache_anonymous_page(view):
+    """Полный кэш ответа для анонимных GET-запросов.
+
+    Запись в кэше хранит теги страницы с номерами поколений; при
+    изменении любой помеченной области страница считается устаревшей.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method != 'GET' or request.user.is_authenticated:
+            return view(request, *args, **kwargs)
+        key = _page_key(request)
+        entry = cache.get(key)
+        if entry is not None:
+            if generations.get_many(entry['tags']) == entry['tags']:
+                return HttpResponse(
+                    entry['content'], content_type=entry['content_type']
+                )
+        request.page_cache_tags = {}
+        response = view(request, *args, **kwargs)
+        if (
+            response.status_code == 200
+            and request.page_cache_tags
+            and not response.cookies
+            and not response.streaming
+        ):
+            cache.set(key, {
+                'tags': request.page_cache_tags,
+                'content': response.content,
+                'content_type': response['Content-Type'],
+            }, settings.PAGE_CACHE_TIMEOUT)
+        return response
+    return wrapper
+
+
+def _etag(request, *scopes):
+    """ETag из поколений областей страницы, адреса и пользователя.
+
+    Страницы вошедшего пользователя содержат CSRF-токен формы, поэтому
+    в ETag входят кука токена и ключ сессии: после их смены браузер не
+    получит 304 со старым токеном, на котором отправка формы упадёт.
+    """
+    versions = generations.get_many(scopes)
+    parts = [request.get_full_path(), str(request.user.pk)]
+    if request.user.is_authenticated:
+        parts.append(request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''))
+        parts.append(request.session.session_key or '')
+    parts.extend(f'{scope}={versions[scope]}' for scope in sorted(versions))
+    return md5('|'.join(parts).encode()).hexdigest()
+
+
+def index_etag(request):
+    return _etag(request, 'index')
+
+
+def group_etag(request, slug):
+    group = lookups.find_group(request, slug)
+    if group is None:
+        return None
+    return _etag(request, f'group:{group.pk}')
+
+
+def profile_etag(request, username):
+    author = lookups.find_user(request, username)
+    if author is None:
+        return None
+    return _etag(request, f'author:{author.pk}')
+
+
+def post_etag(request, post_id):
+    post = Post.objects.filter(pk=post_id).values(
+        'author_id', 'group_id'
+    ).first()
+    if post is None:
+        return None
+    scopes = [f'post:{post_id}', f'author:{post["author_id"]}']
+    if post['group_id'] is not None:
+        scopes.append(f'group:{post["group_id"]}')
+    return _etag(request, *scopes)
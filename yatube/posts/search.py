@@ -0,0 +1,67 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+from .utils import decode_cursor, encode_cursor
+
+WORD = re.compile(r'\w+')
+
+MATCH_SQL = (
+    'SELECT rowid AS id, bm25(posts_post_fts) AS score '
+    'FROM posts_post_fts WHERE posts_post_fts MATCH %s'
+)
+
+
+def to_match(query):
+    """Запрос FTS5 из пользовательской строки; None, если искать нечего.
+
+    Слова берутся в кавычки, чтобы операторы FTS5 в строке не
+    срабатывали; последнее слово ищется как префикс.
+    """
+    words = WORD.findall(query)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def matching_ids(query):
+    """Подзапрос id постов, подходящих под запрос, для ``pk__in``."""
+    return RawSQL(
+        'SELECT rowid FROM posts_post_fts WHERE posts_post_fts MATCH %s',
+        (to_match(query),)
+    )
+
+
+def search_posts(query, after=None, per_page=settings.SORT10):
+    """Посты по запросу, самые релевантные (bm25) первыми.
+
+    Возвращает не больше per_page постов после курсора ``after`` и
+    курсор следующей порции (None, если постов больше нет).
+    """
+    match = to_match(query)
+    if match is None:
+        return [], None
+    sql = f'SELECT id, score FROM ({MATCH_SQL})'
+    params = [match]
+    key = decode_cursor(after, float) if after else None
+    if key is not None:
+        sql += ' WHERE score > %s OR (score = %s AND id > %s)'
+        params += [key[0], key[0], key[1]]
+    sql += ' ORDER BY score, id LIMIT %s'
+    params.append(per_page + 1)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        [pk for pk, _ in rows]
+    )
+    return [posts[pk] for pk, _ in rows if pk in posts], next_cursor
@@ -0,0 +1,215 @@
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from PIL import Image
+
+from . import autocomplete, blobs, generations, lookups, stats, timeline
+from .models import Comment, Follow, Group, Post, User
+from .uploads import placeholder
+
+# Поля, которые выводятся в карточках постов и в подсказках поиска.
+USER_NAME_FIELDS = ('username', 'first_name', 'last_name')
+GROUP_NAME_FIELDS = ('title', 'slug')
+
+
+@receiver(pre_save, sender=Post)
+def post_image_changed(sender, instance, update_fields=None, **kwargs):
+    # Прежний файл нужен post_saved, чтобы перенести ссылку на новый.
+    if update_fields is not None and 'image' not in update_fields:
+        instance._old_image = instance.image.name or ''
+    elif instance.pk is None:
+        instance._old_image = ''
+    else:
+        instance._old_image = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('image', flat=True).first() or ''
+    # Для новой картинки миниатюры создаст thumbnail_worker, до тех пор
+    # выводится оригинал. Файл может быть уже записан в хранилище до
+    # сохранения поста (см. post_create).
+    new_image = instance.image and (
+        not instance.image._committed
+        or instance.image.name != instance._old_image
+    )
+    if new_image:
+        instance.thumbnails = Post.THUMBNAILS_PENDING
+        try:
+            instance.placeholder, instance.dominant_color = placeholder(
+                instance.image.file
+            )
+        except (
+            OSError, SuspiciousFileOperation, Image.DecompressionBombError
+        ):
+            # Файла нет в хранилище или это не картинка.
+            instance.placeholder = instance.dominant_color = ''
+    elif not instance.image:
+        # Миниатюры поста без картинки делать не из чего.
+        instance.thumbnails = Post.THUMBNAILS_READY
+        instance.placeholder = instance.dominant_color = ''
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    generations.bump_post(
+        instance.pk, instance.author_id, instance.group_id
+    )
+    old_image = getattr(instance, '_old_image', '')
+    if (instance.image.name or '') != old_image:
+        blobs.acquire(instance.image.name)
+        blobs.release(old_image)
+    if created:
+        stats.change(instance.author_id, posts_count=1)
+        timeline.push_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    generations.bump_post(
+        instance.pk, instance.author_id, instance.group_id
+    )
+    blobs.release(instance.image.name)
+    stats.change(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        stats.change(instance.user_id, following_count=1)
+        stats.change(instance.author_id, followers_count=1)
+        generations.bump_on_commit(
+            f'author:{instance.user_id}', f'author:{instance.author_id}'
+        )
+        timeline.promote(instance.author_id)
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    stats.change(instance.user_id, following_count=-1)
+    stats.change(instance.author_id, followers_count=-1)
+    generations.bump_on_commit(
+        f'author:{instance.user_id}', f'author:{instance.author_id}'
+    )
+    timeline.trim(instance.user_id, instance.author_id)
+    timeline.demote(instance.author_id)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created and instance.post_id is not None:
+        Post.objects.filter(pk=instance.post_id).update(
+            comments_count=F('comments_count') + 1,
+            updated=timezone.now()
+        )
+        bump_commented_post(instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    if instance.post_id is not None:
+        Post.objects.filter(pk=instance.post_id).update(
+            comments_count=F('comments_count') - 1,
+            updated=timezone.now()
+        )
+        bump_commented_post(instance.post_id)
+
+
+def bump_commented_post(post_id):
+    """Число комментариев выводится в карточке поста."""
+    post = Post.objects.filter(pk=post_id).values(
+        'author_id', 'group_id'
+    ).first()
+    if post is not None:
+        generations.bump_post(post_id, post['author_id'], post['group_id'])
+
+
+def names_changed(instance, fields):
+    """Изменились ли поля, сохранённые обработчиком pre_save."""
+    old = getattr(instance, '_old_names', None)
+    if old is None:
+        return False
+    return old != tuple(getattr(instance, field) for field in fields)
+
+
+@receiver(pre_save, sender=Group)
+def group_renaming(sender, instance, **kwargs):
+    instance._old_names = Group.objects.filter(
+        pk=instance.pk
+    ).values_list(*GROUP_NAME_FIELDS).first()
+    if instance._old_names is not None:
+        cache.delete(lookups.group_key(instance._old_names[1]))
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, **kwargs):
+    cache.delete(lookups.group_key(instance.slug))
+    scopes = ['index', f'group:{instance.pk}']
+    if names_changed(instance, GROUP_NAME_FIELDS):
+        # Название и адрес группы выводятся в карточках постов, в том
+        # числе на страницах авторов, писавших в группу.
+        authors = instance.posts.values_list('author_id', flat=True)
+        scopes.append(f'card_group:{instance.pk}')
+        scopes.extend(
+            f'author:{author_id}' for author_id in authors.distinct()
+        )
+    generations.bump_on_commit(*scopes)
+    transaction.on_commit(
+        lambda: autocomplete.index.group_changed(instance.pk, instance)
+    )
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    cache.delete(lookups.group_key(instance.slug))
+    generations.bump_on_commit('index', f'group:{instance.pk}')
+    # После удаления у экземпляра уже не будет id.
+    pk = instance.pk
+    transaction.on_commit(lambda: autocomplete.index.group_changed(pk))
+
+
+@receiver(pre_save, sender=User)
+def user_renaming(sender, instance, update_fields=None, **kwargs):
+    # Вход в аккаунт сохраняет только last_login: имена не меняются.
+    if update_fields is not None and not (
+        set(USER_NAME_FIELDS) & set(update_fields)
+    ):
+        instance._old_names = None
+        return
+    instance._old_names = User.objects.filter(
+        pk=instance.pk
+    ).values_list(*USER_NAME_FIELDS).first()
+    if instance._old_names is not None:
+        cache.delete(lookups.user_key(instance._old_names[0]))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, signal, created=False, **kwargs):
+    cache.delete(lookups.user_key(instance.username))
+    deleted = signal is post_delete
+    renamed = not deleted and names_changed(instance, USER_NAME_FIELDS)
+    if not (created or deleted or renamed):
+        return
+    if renamed:
+        # Имя автора выводится в карточках его постов во всех лентах,
+        # а имя комментатора и ссылка на его профиль — на страницах
+        # прокомментированных постов.
+        groups = Post.objects.filter(
+            author_id=instance.pk, group__isnull=False
+        ).values_list('group_id', flat=True)
+        commented = Comment.objects.filter(
+            author_id=instance.pk
+        ).values_list('post_id', flat=True)
+        generations.bump_on_commit(
+            'index',
+            f'author:{instance.pk}',
+            f'card_author:{instance.pk}',
+            *(f'group:{group_id}' for group_id in groups.distinct()),
+            *(f'post:{post_id}' for post_id in commented.distinct())
+        )
+    pk = instance.pk
+    user = None if deleted else instance
+    transaction.on_commit(lambda: autocomplete.index.user_changed(pk, user))
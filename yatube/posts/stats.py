@@ -0,0 +1,40 @@
+from django.db import transaction
+from django.db.models import F
+
+from .models import Follow, Post, UserStats
+
+
+def get_stats(user):
+    """Счётчики пользователя; без строки в базе все они нулевые."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return UserStats(user=user)
+
+
+def recount(user_id):
+    """Пересчитывает счётчики пользователя по исходным таблицам."""
+    counts = {
+        'posts_count': Post.objects.filter(author_id=user_id).count(),
+        'followers_count': Follow.objects.filter(author_id=user_id).count(),
+        'following_count': Follow.objects.filter(user_id=user_id).count(),
+    }
+    stats, _ = UserStats.objects.update_or_create(
+        user_id=user_id, defaults=counts
+    )
+    return stats
+
+
+def change(user_id, **deltas):
+    """Сдвигает счётчики пользователя на заданные величины.
+
+    Строка создаётся пересчётом при первом увеличении; уменьшение
+    счётчика пользователя без строки ничего не делает — так удаление
+    пользователя каскадом не создаёт для него новую статистику.
+    """
+    with transaction.atomic():
+        updated = UserStats.objects.filter(user_id=user_id).update(**{
+            field: F(field) + delta for field, delta in deltas.items()
+        })
+        if not updated and any(delta > 0 for delta in deltas.values()):
+            recount(user_id)
@@ -0,0 +1,57 @@
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, называющее файлы по SHA-256 их содержимого.
+
+    Файл из ``upload_to/photo.jpg`` ложится в ``upload_to/ab/<sha256>.jpg``.
+    Хэш считается по ходу записи во временный файл рядом с целевым;
+    если такое содержимое уже есть, копия не сохраняется, а у
+    существующего файла обновляется время изменения, чтобы сборщик
+    неиспользуемых файлов (collect_images) его не тронул. Вместе с файлом
+    заводится его строка ImageBlob: без неё сборщик не узнал бы о файле,
+    пост которого так и не сохранился.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # Имя определяется содержимым, подбирать свободное не нужно.
+        return name
+
+    def _save(self, name, content):
+        directory, filename = posixpath.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        full_directory = self.path(directory)
+        os.makedirs(full_directory, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, temp_path = tempfile.mkstemp(dir=full_directory, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    temp_file.write(chunk)
+            content_hash = digest.hexdigest()
+            name = posixpath.join(
+                directory, content_hash[:2], content_hash + extension
+            )
+            full_path = self.path(name)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            if os.path.exists(full_path):
+                os.utime(full_path)
+                os.remove(temp_path)
+            else:
+                if self.file_permissions_mode is not None:
+                    os.chmod(temp_path, self.file_permissions_mode)
+                os.replace(temp_path, full_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        # Модели импортируют хранилище, поэтому blobs — только здесь.
+        from .blobs import register
+        register(name)
+        return name
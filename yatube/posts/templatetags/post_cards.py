@@ -0,0 +1,64 @@
+from django import template
+from django.core.cache import cache
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+from .. import generations
+from ..thumbnails import attach
+
+register = template.Library()
+
+CARD_TEMPLATE = 'posts/includes/card.html'
+CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def card_scopes(post):
+    """Области, поколения которых меняются вместе с именами в карточке."""
+    scopes = [f'card_author:{post.author_id}']
+    if post.group_id is not None:
+        scopes.append(f'card_group:{post.group_id}')
+    return scopes
+
+
+def card_key(post, variant, versions):
+    names = ':'.join(str(versions[scope]) for scope in card_scopes(post))
+    return f'post_card:{post.pk}:{post.updated.timestamp()}:{names}:{variant}'
+
+
+@register.simple_tag(takes_context=True)
+def cached_cards(context, posts):
+    """Карточки постов страницы, собранные из кэша одним get_many.
+
+    Вариант карточки зависит от флагов ``author``/``group`` в контексте
+    ленты и от того, последняя ли она на странице. Поколения имён
+    авторов и групп страницы и миниатюры для перерисовываемых карточек
+    тоже собираются одним запросом к кэшу.
+    """
+    posts = list(posts)
+    versions = generations.get_many(
+        {scope for post in posts for scope in card_scopes(post)}
+    )
+    card_context = {
+        'author': context.get('author'),
+        'group': context.get('group'),
+    }
+    variant = ''.join(str(int(bool(flag))) for flag in card_context.values())
+    keys = [
+        card_key(post, f'{variant}{int(post is posts[-1])}', versions)
+        for post in posts
+    ]
+    cards = cache.get_many(keys)
+    missing = {}
+    card_template = get_template(CARD_TEMPLATE)
+    attach([post for post, key in zip(posts, keys) if key not in cards])
+    for post, key in zip(posts, keys):
+        if key not in cards:
+            missing[key] = card_template.render({
+                **card_context,
+                'post': post,
+                'forloop': {'last': post is posts[-1]},
+            })
+    if missing:
+        cache.set_many(missing, CARD_CACHE_TIMEOUT)
+        cards.update(missing)
+    return [mark_safe(cards[key]) for key in keys]
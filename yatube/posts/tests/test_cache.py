@@ -1,9 +1,18 @@
+import warnings
+from http import HTTPStatus
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.core.cache import cache
-from django.test import Client, TestCase
+from django.core.cache import CacheKeyWarning, cache
+from django.db import connection
+from django.template import Context, Template
+from django.db import transaction
+from django.test import Client, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import Group, Post
+from .. import generations
+from ..models import Comment, Group, Post
 
 User = get_user_model()
 
@@ -31,16 +40,35 @@ class PaginatorViewsTest(TestCase):
     def test_cache_on_index_page_exists(self):
         """Кэширование данных на главной странице существует."""
         cache_response = self.authorized_client.get(reverse('posts:index'))
-        Post.objects.all().delete()
+        Post.objects.filter(pk=self.post.pk).update(text='Обновлено')
         cache_response2 = self.authorized_client.get(reverse('posts:index'))
         self.assertEqual(cache_response.content, cache_response2.content)
         cache.clear()
         response_cleared = self.authorized_client.get(reverse('posts:index'))
         self.assertNotEqual(
-            cache_response,
-            response_cleared
+            cache_response.content,
+            response_cleared.content
         )
 
+    def test_cache_invalidated_on_write(self):
+        """Запись в ленту сразу сбрасывает закэшированные фрагменты."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.author.username,)),
+        )
+        responses = [self.authorized_client.get(url) for url in urls]
+        Post.objects.create(
+            text='Свежий пост',
+            group=self.group,
+            author=self.author
+        )
+        for url, response in zip(urls, responses):
+            with self.subTest(url=url):
+                new_response = self.authorized_client.get(url)
+                self.assertNotEqual(response.content, new_response.content)
+                self.assertContains(new_response, 'Свежий пост')
+
     def test_cache_on_index_page_updates(self):
         """Данные на странице обновляются."""
         response = self.authorized_client.get(reverse('posts:index'))
@@ -56,3 +84,154 @@ class PaginatorViewsTest(TestCase):
             cache_response,
             response.content
         )
+
+    def test_card_cache_keyed_on_updated(self):
+        """Карточка поста кэшируется до изменения поста."""
+        template = Template(
+            '{% load post_cards %}{% cached_cards posts as cards %}'
+            '{% for card in cards %}{{ card }}{% endfor %}'
+        )
+        cache.clear()
+        template.render(Context({'posts': [self.post]}))
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигналов')
+        post = Post.objects.get(pk=self.post.pk)
+        html = template.render(Context({'posts': [post]}))
+        self.assertIn(self.post.text, html)
+        post.save()
+        html = template.render(Context({'posts': [post]}))
+        self.assertIn('Без сигналов', html)
+
+    def test_anonymous_page_cache_purged_by_tags(self):
+        """Страницы для анонимов кэшируются целиком и сбрасываются тегами."""
+        cache.clear()
+        index_url = reverse('posts:index')
+        detail_url = reverse('posts:post_detail', args=(self.post.pk,))
+        self.client.get(index_url)
+        self.client.get(detail_url)
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигналов')
+        response = self.client.get(detail_url)
+        self.assertIsNone(response.context)
+        self.assertNotContains(response, 'Без сигналов')
+        Comment.objects.create(
+            post=self.post, author=self.author, text='Комментарий'
+        )
+        response = self.client.get(detail_url)
+        self.assertIsNotNone(response.context)
+        self.assertContains(response, 'Без сигналов')
+        response = self.client.get(index_url)
+        self.assertIsNotNone(response.context)
+
+    def test_conditional_get(self):
+        """Неизменившаяся страница отвечает 304 по ETag."""
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        # Первый ответ выдаёт куку CSRF-токена, входящую в ETag.
+        self.authorized_client.get(url)
+        response = self.authorized_client.get(url)
+        etag = response['ETag']
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        Comment.objects.create(
+            post=self.post, author=self.author, text='Комментарий'
+        )
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_commenter_rename_reaches_post_page(self):
+        """Новое имя комментатора видно на закэшированной странице поста."""
+        commenter = User.objects.create_user(username='commenter')
+        Comment.objects.create(
+            post=self.post, author=commenter, text='Комментарий'
+        )
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        self.client.get(url)
+        etag = self.client.get(url)['ETag']
+        commenter.username = 'renamed_commenter'
+        commenter.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, 'renamed_commenter')
+
+    def test_conditional_get_follows_csrf_token(self):
+        """После смены CSRF-токена страница с формой отдаётся заново."""
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        self.authorized_client.get(url)
+        response = self.authorized_client.get(url)
+        etag = response['ETag']
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.authorized_client.cookies[settings.CSRF_COOKIE_NAME] = 'x' * 64
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_lookup_keys_are_safe(self):
+        """Slug с пробелом не даёт предупреждений о ключе кэша."""
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', CacheKeyWarning)
+            group = Group.objects.create(
+                title='Группа', slug='slug с пробелом', description='-'
+            )
+            group.title = 'Переименованная группа'
+            group.save()
+
+    def test_group_lookup_cached(self):
+        """Группа по slug берётся из кэша и забывается при переименовании."""
+        url = reverse('posts:group_list', args=(self.group.slug,))
+        self.authorized_client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client.get(url)
+        self.assertFalse(any(
+            'FROM "posts_group"' in query['sql']
+            for query in queries.captured_queries
+        ))
+        self.group.slug = 'renamed-slug'
+        self.group.save()
+        response = self.authorized_client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        response = self.authorized_client.get(
+            reverse('posts:group_list', args=('renamed-slug',))
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.group.slug = 'test-slug'
+        self.group.save()
+
+    def test_renames_reach_cached_cards(self):
+        """Новое имя автора и название группы видны во всех лентах."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.author.username,)),
+        )
+        for url in urls:
+            self.client.get(url)
+        author = User.objects.get(pk=self.author.pk)
+        author.first_name = 'Переименованный'
+        author.save()
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Новая группа'
+        group.save()
+        updated = Post.objects.filter(pk=self.post.pk).values_list(
+            'updated', flat=True
+        ).get()
+        self.assertEqual(updated, self.post.updated)
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, 'Переименованный')
+        response = self.client.get(urls[0])
+        self.assertContains(response, 'все записи группы: Новая группа')
+        response = self.client.get(urls[2])
+        self.assertContains(response, 'все записи группы: Новая группа')
+
+
+class GenerationCommitTest(TransactionTestCase):
+    def test_bumped_after_commit(self):
+        """Поколение снова сдвигается, когда запись становится видна."""
+        author = User.objects.create_user(username='committer')
+        before = generations.get('index')
+        with transaction.atomic():
+            Post.objects.create(text='В транзакции', author=author)
+            inside = generations.get('index')
+        self.assertNotEqual(inside, before)
+        self.assertNotEqual(generations.get('index'), inside)
@@ -1,6 +1,9 @@
+import os
 import shutil
 import tempfile
+from datetime import timedelta
 from http import HTTPStatus
+from io import BytesIO
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
@@ -8,12 +11,27 @@ from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import get_thumbnail
 
-from ..models import Group, Post
+from core.resize import resize, resized_path
+
+from .. import blobs, thumbnails
+from ..models import Group, ImageBlob, Post
 
 User = get_user_model()
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+EXIF_ORIENTATION = 0x0112
+STORED_IMAGE_NAME = r'^posts/[0-9a-f]{2}/[0-9a-f]{64}\.gif$'
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -82,7 +100,7 @@ class PostFormsTest(TestCase):
             Post.objects.filter(
                 group=form_data['group'],
                 text=form_data['text'],
-                image='posts/small.gif'
+                image__regex=STORED_IMAGE_NAME
             ).exists()
         )
 
@@ -129,7 +147,7 @@ class PostFormsTest(TestCase):
             Post.objects.filter(
                 group=edit_form_data['group'],
                 text=edit_form_data['text'],
-                image='posts/small2.gif'
+                image__regex=STORED_IMAGE_NAME
             ).exists()
         )
         response = self.authorized_author.post(
@@ -138,6 +156,158 @@ class PostFormsTest(TestCase):
         self.assertEqual(response.status_code, HTTPStatus.OK)
         self.assertEqual(len(response.context['page_obj']), settings.ZERO)
 
+    def test_thumbnails_made_by_worker(self):
+        """До работы воркера выводится оригинал, после — миниатюра."""
+        uploaded = SimpleUploadedFile(
+            name='thumb.gif',
+            content=SMALL_GIF,
+            content_type='image/gif'
+        )
+        post = Post.objects.create(
+            author=self.author, text='С картинкой', image=uploaded
+        )
+        self.assertEqual(post.thumbnails, Post.THUMBNAILS_PENDING)
+        url = reverse('posts:post_detail', args=(post.id,))
+        response = self.authorized_author.get(url)
+        self.assertContains(response, post.image.url)
+        self.assertEqual(thumbnails.process_pending(), 1)
+        post.refresh_from_db()
+        self.assertEqual(post.thumbnails, Post.THUMBNAILS_READY)
+        response = self.authorized_author.get(url)
+        self.assertNotContains(response, post.image.url)
+        self.assertContains(response, settings.MEDIA_URL + 'cache/')
+
+    def test_imageless_post_not_queued(self):
+        """Пост без картинки не попадает в очередь миниатюр."""
+        post = Post.objects.create(author=self.author, text='Без картинки')
+        self.assertEqual(post.thumbnails, Post.THUMBNAILS_READY)
+        self.assertFalse(thumbnails.pending().filter(pk=post.pk).exists())
+
+    def test_thumbnails_attached_in_batch(self):
+        """Миниатюры страницы берутся из KV-хранилища без запросов к БД."""
+        posts = []
+        for number in range(3):
+            uploaded = SimpleUploadedFile(
+                name=f'batch{number}.gif',
+                content=SMALL_GIF,
+                content_type='image/gif'
+            )
+            posts.append(Post.objects.create(
+                author=self.author, text='С картинкой', image=uploaded
+            ))
+        thumbnails.process_pending()
+        posts = list(Post.objects.filter(pk__in=[post.pk for post in posts]))
+        with self.assertNumQueries(0):
+            thumbnails.attach(posts)
+        geometry, options, widths = thumbnails.CARD_PICTURE
+        for post in posts:
+            self.assertEqual(
+                post.card_picture['src'].url,
+                get_thumbnail(post.image, geometry, **options).url
+            )
+            for source in post.card_picture['sources']:
+                self.assertEqual(
+                    source['srcset'].count('w,'), len(widths) - 1
+                )
+
+    @override_settings(IMAGE_MAX_SIDE=500)
+    def test_image_ingested(self):
+        """Картинка уменьшается, поворачивается по EXIF и теряет EXIF."""
+        exif = Image.Exif()
+        exif[EXIF_ORIENTATION] = 6
+        content = BytesIO()
+        Image.new('RGB', (3000, 1000)).save(
+            content, 'JPEG', exif=exif.tobytes()
+        )
+        uploaded = SimpleUploadedFile(
+            name='photo.jpg',
+            content=content.getvalue(),
+            content_type='image/jpeg'
+        )
+        self.authorized_author.post(
+            reverse('posts:post_create'),
+            data={'text': 'Фото', 'image': uploaded}
+        )
+        post = Post.objects.get(text='Фото')
+        with Image.open(post.image) as image:
+            self.assertEqual(image.size, (167, 500))
+            self.assertNotIn(EXIF_ORIENTATION, image.getexif())
+        self.assertEqual(post.thumbnails, Post.THUMBNAILS_PENDING)
+        self.assertTrue(post.placeholder)
+        self.assertEqual(ImageBlob.objects.get(name=post.image.name).refs, 1)
+
+    @override_settings(IMAGE_MAX_UPLOAD_SIZE=32)
+    def test_oversized_image_rejected(self):
+        """Слишком большой файл отбрасывается с ошибкой формы."""
+        post_count = Post.objects.count()
+        uploaded = SimpleUploadedFile(
+            name='big.gif',
+            content=SMALL_GIF,
+            content_type='image/gif'
+        )
+        response = self.authorized_author.post(
+            reverse('posts:post_create'),
+            data={'text': 'Большая картинка', 'image': uploaded}
+        )
+        self.assertEqual(Post.objects.count(), post_count)
+        self.assertTrue(response.context['form'].has_error('image'))
+
+    def test_identical_images_stored_once(self):
+        """Одинаковые картинки хранятся одним файлом до последней ссылки."""
+        posts = [
+            Post.objects.create(
+                author=self.author,
+                text='Повтор',
+                image=SimpleUploadedFile(f'copy{number}.gif', SMALL_GIF)
+            )
+            for number in range(2)
+        ]
+        name = posts[0].image.name
+        storage = posts[0].image.storage
+        self.assertEqual(posts[1].image.name, name)
+        self.assertEqual(ImageBlob.objects.get(name=name).refs, 2)
+        posts[0].delete()
+        self.assertEqual(blobs.collect(grace=timedelta(0)), 0)
+        self.assertTrue(storage.exists(name))
+        posts[1].image = ''
+        posts[1].save()
+        self.assertEqual(ImageBlob.objects.get(name=name).refs, 0)
+        os.utime(storage.path(name), (0, 0))
+        resized = resized_path(40, 20, name)
+        resize(storage.path(name), resized, (40, 20))
+        self.assertEqual(blobs.collect(grace=timedelta(0)), 1)
+        self.assertFalse(storage.exists(name))
+        self.assertFalse(os.path.exists(resized))
+
+    def test_orphaned_upload_collected(self):
+        """Файл, пост которого так и не сохранился, удаляет сборщик."""
+        storage = Post._meta.get_field('image').storage
+        name = storage.save(
+            'posts/orphan.gif', SimpleUploadedFile('orphan.gif', b'orphan')
+        )
+        self.assertEqual(ImageBlob.objects.get(name=name).refs, 0)
+        self.assertEqual(blobs.collect(grace=timedelta(hours=1)), 0)
+        os.utime(storage.path(name), (0, 0))
+        self.assertEqual(blobs.collect(grace=timedelta(0)), 1)
+        self.assertFalse(storage.exists(name))
+
+    def test_image_placeholder(self):
+        """Заглушка и основной цвет картинки встраиваются в страницу."""
+        content = BytesIO()
+        Image.new('RGB', (64, 64), (255, 0, 0)).save(content, 'PNG')
+        post = Post.objects.create(
+            author=self.author,
+            text='Красное',
+            image=SimpleUploadedFile('red.png', content.getvalue())
+        )
+        self.assertEqual(post.dominant_color, '#ff0000')
+        self.assertTrue(post.placeholder.startswith('data:image/jpeg'))
+        response = self.authorized_author.get(
+            reverse('posts:post_detail', args=(post.id,))
+        )
+        self.assertContains(response, post.placeholder)
+        self.assertContains(response, post.dominant_color)
+
     def test_anonymous_create_post(self):
         """Создание поста анонимом."""
         post_count = Post.objects.count()
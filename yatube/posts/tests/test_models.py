@@ -1,7 +1,8 @@
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError
 from django.test import TestCase
 
-from ..models import Group, Post
+from ..models import Follow, Group, Post
 
 User = get_user_model()
 
@@ -35,3 +36,10 @@ class PostModelTest(TestCase):
         # post_text15 = post._meta.get_field('text'[:15])
         expected_object_name = self.post.text[:15]
         self.assertEqual(expected_object_name, 'Тестовая пост1234'[:15])
+
+    def test_follow_is_unique(self):
+        """Повторная подписка на автора не создаёт дубль."""
+        author = User.objects.create_user(username='author')
+        Follow.objects.create(user=self.user, author=author)
+        with self.assertRaises(IntegrityError):
+            Follow.objects.create(user=self.user, author=author)
@@ -1,16 +1,30 @@
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
-from django.test import Client, TestCase
+from django.db import connection
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings
+)
 from django.urls import reverse
 from django import forms
 
+from ..autocomplete import AutocompleteIndex, _change_key
 from ..forms import PostForm
-from ..models import Group, Post, Follow
+from ..models import Comment, Group, Post, Follow
+from ..search import search_posts
+from ..utils import CursorPaginator, CursorSource
 from yatube import settings
 
 User = get_user_model()
 
 
+def query_plan(queryset):
+    """EXPLAIN QUERY PLAN запроса одной строкой."""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return ' | '.join(row[-1] for row in cursor.fetchall())
+
+
 class CorrectTemplateTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -191,6 +205,69 @@ class PaginatorViewsTest(TestCase):
                         )
         self.assertEqual(len(response.context['page_obj']), units)
 
+    def test_cursor_pagination(self):
+        """Проверка курсорной пагинации по after/before"""
+        response = self.authorized_user.get(reverse('posts:index'))
+        first_page = response.context['page_obj']
+        self.assertEqual(len(first_page), settings.SORT10)
+        self.assertFalse(first_page.has_previous())
+        response = self.authorized_user.get(
+            reverse('posts:index') + f'?after={first_page.next_cursor}'
+        )
+        second_page = response.context['page_obj']
+        self.assertEqual(len(second_page), settings.SORT13 - settings.SORT10)
+        self.assertFalse(second_page.has_next())
+        self.assertEqual(
+            set(first_page) & set(second_page), set()
+        )
+        response = self.authorized_user.get(
+            reverse('posts:index') + f'?before={second_page.previous_cursor}'
+        )
+        self.assertEqual(
+            list(response.context['page_obj']), list(first_page)
+        )
+
+    def test_cursor_query_plan(self):
+        """Курсорная страница читается диапазоном индекса без сортировки."""
+        post = Post.objects.order_by('pub_date').first()
+        key = (post.pub_date, post.pk)
+        posts = Post.objects.select_related('group', 'author')
+        feeds = (
+            (posts, 'post_pub_date_idx (pub_date'),
+            (
+                posts.filter(author=self.user),
+                'post_author_pub_date_idx (author_id=? AND pub_date'
+            ),
+            (
+                posts.filter(group=self.group),
+                'post_group_pub_date_idx (group_id=? AND pub_date'
+            ),
+        )
+        for queryset, index in feeds:
+            source = CursorSource(queryset)
+            for rows in (source.rows(after=key), source.rows(before=key)):
+                plan = query_plan(rows[:settings.SORT10 + 1])
+                with self.subTest(plan=plan):
+                    self.assertIn(f'USING INDEX {index}', plan)
+                    self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_elided_page_range(self):
+        """Окно номеров страниц вместо полного page_range"""
+        paginator = CursorPaginator(Post.objects.all(), 1)
+        ellipsis = paginator.ELLIPSIS
+        self.assertEqual(
+            list(paginator.get_elided_page_range(
+                7, on_each_side=1, on_ends=1
+            )),
+            [1, ellipsis, 6, 7, 8, ellipsis, settings.SORT13]
+        )
+        response = self.authorized_user.get(
+            reverse('posts:index') + '?page=1'
+        )
+        self.assertEqual(
+            response.context['page_obj'].elided_page_range, [1, 2]
+        )
+
 
 class CommentFollowTests(TestCase):
     @classmethod
@@ -247,6 +324,141 @@ class CommentFollowTests(TestCase):
         follow_count2 = Follow.objects.count()
         self.assertEqual(follow_count - 1, follow_count2)
 
+    def test_timeline_fan_out(self):
+        """Лента подписок наполняется при подписке и публикации"""
+        Follow.objects.create(user=self.follower, author=self.following)
+        self.assertTrue(
+            self.follower.timeline.filter(post=self.post).exists()
+        )
+        new_post = Post.objects.create(
+            author=self.following,
+            text='Новый пост в ленту',
+        )
+        response = self.authorized_follower_client.get(
+            reverse('posts:follow_index')
+        )
+        self.assertEqual(
+            list(response.context['page_obj']), [new_post, self.post]
+        )
+        self.authorized_follower_client.get(
+            reverse('posts:profile_unfollow', args=(self.following,))
+        )
+        self.assertFalse(self.follower.timeline.exists())
+
+    @override_settings(FEED_PULL_THRESHOLD=0)
+    def test_pulled_author_feed(self):
+        """Посты популярного автора подмешиваются при чтении ленты"""
+        Follow.objects.create(user=self.follower, author=self.following)
+        new_post = Post.objects.create(
+            author=self.following,
+            text='Пост популярного автора',
+        )
+        self.assertFalse(self.follower.timeline.exists())
+        response = self.authorized_follower_client.get(
+            reverse('posts:follow_index')
+        )
+        self.assertEqual(
+            list(response.context['page_obj']), [new_post, self.post]
+        )
+
+    @override_settings(FEED_PULL_THRESHOLD=1)
+    def test_demoted_author_feed(self):
+        """После падения до порога посты автора дозаполняют ленты"""
+        other = User.objects.create_user(username='other_follower')
+        Follow.objects.create(user=self.follower, author=self.following)
+        Follow.objects.create(user=other, author=self.following)
+        new_post = Post.objects.create(
+            author=self.following,
+            text='Пост, написанный при режиме чтения',
+        )
+        self.assertFalse(
+            self.follower.timeline.filter(post=new_post).exists()
+        )
+        Follow.objects.filter(user=other).delete()
+        response = self.authorized_follower_client.get(
+            reverse('posts:follow_index')
+        )
+        self.assertEqual(
+            list(response.context['page_obj']), [new_post, self.post]
+        )
+        self.assertTrue(
+            self.follower.timeline.filter(post=new_post).exists()
+        )
+
+    @override_settings(FEED_BACKFILL_LIMIT=1)
+    def test_backfill_limited(self):
+        """При подписке в ленту попадают только последние посты автора"""
+        new_post = Post.objects.create(
+            author=self.following,
+            text='Самый свежий пост',
+        )
+        Follow.objects.create(user=self.follower, author=self.following)
+        self.assertEqual(
+            [entry.post for entry in self.follower.timeline.all()],
+            [new_post]
+        )
+
+    def test_profile_counters(self):
+        """Счётчики профиля обновляются без COUNT-запросов"""
+        Follow.objects.create(user=self.follower, author=self.following)
+        post = Post.objects.create(author=self.following, text='Ещё пост')
+        response = self.authorized_follower_client.get(
+            reverse('posts:profile', args=(self.following,))
+        )
+        author_stats = response.context['author_stats']
+        self.assertEqual(author_stats.posts_count, 2)
+        self.assertEqual(author_stats.followers_count, 1)
+        self.assertEqual(author_stats.following_count, 0)
+        post.delete()
+        self.authorized_follower_client.get(
+            reverse('posts:profile_unfollow', args=(self.following,))
+        )
+        self.following.stats.refresh_from_db()
+        self.assertEqual(self.following.stats.posts_count, 1)
+        self.assertEqual(self.following.stats.followers_count, 0)
+        self.follower.stats.refresh_from_db()
+        self.assertEqual(self.follower.stats.following_count, 0)
+
+    def test_comments_count(self):
+        """Число комментариев на карточке без лишних запросов"""
+        self.authorized_follower_client.post(
+            reverse('posts:add_comment', args=(self.post.id,)),
+            data={'text': 'Комментарий'}
+        )
+        cache.clear()
+        response = self.authorized_follower_client.get(
+            reverse('posts:profile', args=(self.following,))
+        )
+        self.assertEqual(response.context['page_obj'][0].comments_count, 1)
+        self.assertContains(response, 'Комментариев: 1')
+        Comment.objects.filter(post=self.post).delete()
+        self.assertEqual(
+            Post.objects.get(pk=self.post.pk).comments_count, 0
+        )
+
+    def test_comments_pagination(self):
+        """Комментарии отдаются порциями, остальные — фрагментом"""
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.follower, text=f'Ком {i}')
+            for i in range(settings.SORT13)
+        )
+        response = self.authorized_follower_client.get(
+            reverse('posts:post_detail', args=(self.post.id,))
+        )
+        self.assertEqual(len(response.context['comments']), settings.SORT10)
+        cursor = response.context['comments_cursor']
+        self.assertIsNotNone(cursor)
+        response = self.client.get(
+            reverse('posts:post_comments', args=(self.post.id,))
+            + f'?after={cursor}'
+        )
+        self.assertTemplateUsed(response, 'posts/includes/comment_list.html')
+        self.assertEqual(
+            len(response.context['comments']),
+            settings.SORT13 - settings.SORT10
+        )
+        self.assertIsNone(response.context['comments_cursor'])
+
     def test_follow_self(self):
         """Тестирование подписки на самого себя"""
         follow_count = Follow.objects.count()
@@ -258,3 +470,117 @@ class CommentFollowTests(TestCase):
         )
         follow_count2 = Follow.objects.count()
         self.assertEqual(follow_count, follow_count2)
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='writer')
+        cls.best = Post.objects.create(
+            author=cls.author, text='Ежик ежик ежик в тумане'
+        )
+        cls.other = Post.objects.create(
+            author=cls.author, text='Туман над рекой и один ежик'
+        )
+        Post.objects.create(author=cls.author, text='Про лошадь')
+
+    def test_search_ranked_by_bm25(self):
+        """Поиск находит слова и префиксы, лучшие совпадения первыми."""
+        response = self.client.get(reverse('posts:search'), {'q': 'ежик'})
+        self.assertEqual(
+            response.context['posts'], [self.best, self.other]
+        )
+        response = self.client.get(reverse('posts:search'), {'q': 'тума'})
+        self.assertEqual(len(response.context['posts']), 2)
+
+    def test_search_cursor(self):
+        """Следующая порция выдачи начинается после курсора."""
+        first, cursor = search_posts('ежик', per_page=1)
+        self.assertEqual(first, [self.best])
+        second, cursor = search_posts('ежик', after=cursor, per_page=1)
+        self.assertEqual(second, [self.other])
+        self.assertIsNone(cursor)
+
+    def test_index_follows_updates(self):
+        """Индекс обновляется и при QuerySet.update()."""
+        Post.objects.filter(pk=self.other.pk).update(text='Про кошку')
+        self.assertEqual(search_posts('ежик')[0], [self.best])
+        self.assertEqual(search_posts('кошку')[0], [self.other])
+        self.assertEqual(search_posts('"OR" NEAR(')[0], [])
+
+    def test_admin_search(self):
+        """Поиск в админке идёт по полнотекстовому индексу."""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'лошадь'}
+        )
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+
+class AutocompleteTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='leo', first_name='Лев', last_name='Толстой'
+        )
+        self.group = Group.objects.create(
+            title='Русская классика', slug='classics', description='-'
+        )
+
+    def complete(self, query, index=None):
+        if index is not None:
+            return [item['label'] for item in index.complete(query)]
+        response = self.client.get(
+            reverse('posts:autocomplete'), {'q': query}
+        )
+        return [item['label'] for item in response.json()['results']]
+
+    def test_prefixes(self):
+        """Подсказки находятся по префиксу имени, фамилии, slug и слов."""
+        self.assertEqual(self.complete('то'), ['leo (Лев Толстой)'])
+        self.assertEqual(self.complete('LE'), ['leo (Лев Толстой)'])
+        self.assertEqual(self.complete('клас'), ['Русская классика'])
+        self.assertEqual(self.complete('class'), ['Русская классика'])
+        self.assertEqual(self.complete('нет такого'), [])
+
+    def test_no_queries_per_keystroke(self):
+        """Подсказки отдаются из памяти и следуют за изменениями."""
+        self.complete('l')
+        with self.assertNumQueries(0):
+            self.complete('le')
+        self.user.username = 'lev'
+        self.user.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.complete('lev'), ['lev (Лев Толстой)'])
+        self.group.delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.complete('клас'), [])
+
+    def test_other_worker_applies_changes(self):
+        """Другой процесс применяет журнал изменений без запросов к базе."""
+        other = AutocompleteIndex()
+        other.complete('l')
+        self.user.username = 'lev'
+        self.user.save()
+        self.group.delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self.complete('lev', other), ['lev (Лев Толстой)']
+            )
+            self.assertEqual(self.complete('клас', other), [])
+
+    def test_lost_change_rebuilds(self):
+        """Без записи журнала отставший процесс перестраивает индекс."""
+        other = AutocompleteIndex()
+        other.complete('l')
+        self.user.username = 'lev'
+        self.user.save()
+        cache.delete(_change_key(other.generation + 1))
+        with self.assertNumQueries(2):
+            self.assertEqual(
+                self.complete('lev', other), ['lev (Лев Толстой)']
+            )
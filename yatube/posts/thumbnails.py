@@ -0,0 +1,158 @@
+import logging
+
+from django.utils import timezone
+from PIL import features
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+
+from . import generations
+from .models import Post
+from .uploads import placeholder
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 50
+
+# Картинки карточки и страницы поста: геометрия и параметры полной
+# JPEG-миниатюры (те же, что у запасных тегов {% thumbnail %} в
+# card.html и post_detail.html) и ширины уменьшенных вариантов для srcset.
+CARD_PICTURE = ('1295x300', {'crop': 'center'}, (480, 768, 1295))
+DETAIL_PICTURE = (
+    '960x339', {'crop': 'center', 'upscale': True}, (480, 960)
+)
+PICTURES = (CARD_PICTURE, DETAIL_PICTURE)
+
+# WebP пишется, только если Pillow собран с libwebp.
+FORMATS = ('WEBP', 'JPEG') if features.check('webp') else ('JPEG',)
+FORMAT_TYPES = {'WEBP': 'image/webp', 'JPEG': 'image/jpeg'}
+
+
+def variants(picture):
+    """Миниатюры картинки: (формат, ширина, геометрия, параметры)."""
+    geometry, options, widths = picture
+    width, height = map(int, geometry.split('x'))
+    for image_format in FORMATS:
+        for variant_width in widths:
+            variant_options = dict(options)
+            if image_format != 'JPEG':
+                variant_options['format'] = image_format
+            variant_height = round(height * variant_width / width)
+            yield (
+                image_format,
+                variant_width,
+                f'{variant_width}x{variant_height}',
+                variant_options,
+            )
+
+
+def generate(image):
+    """Создаёт все миниатюры картинки; False, если хоть одна не вышла."""
+    created = True
+    for picture in PICTURES:
+        for _, _, geometry, options in variants(picture):
+            thumbnail = get_thumbnail(image, geometry, **options)
+            created = created and thumbnail.exists()
+    return created
+
+
+def _thumbnail_file(image, geometry, options):
+    """ImageFile миниатюры с тем же именем, что даст ``get_thumbnail``."""
+    backend = default.backend
+    source = ImageFile(image)
+    options = dict(options)
+    if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(thumbnail_settings, attr)
+        if value != getattr(default_settings, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return ImageFile(name, default.storage)
+
+
+def attach(posts, picture=CARD_PICTURE, attr='card_picture'):
+    """Кладёт в ``attr`` каждого поста варианты его миниатюры.
+
+    Метаданные всех миниатюр постов берутся из кэша KV-хранилища sorl
+    одним ``get_many``; промахи дочитываются по одной, как это сделал
+    бы тег ``{% thumbnail %}``. Значение — словарь с полной JPEG-
+    миниатюрой ``src`` и списком ``sources`` из MIME-типа и srcset
+    каждого формата. Посты без готовых миниатюр получают None.
+    """
+    files = {}
+    for post in posts:
+        setattr(post, attr, None)
+        if post.image and post.thumbnails_ready:
+            for variant in variants(picture):
+                _, _, geometry, options = variant
+                thumbnail = _thumbnail_file(post.image, geometry, options)
+                # Одинаковые картинки разных постов — один и тот же файл.
+                files.setdefault(add_prefix(thumbnail.key), []).append(
+                    (post, variant)
+                )
+    if not files:
+        return
+    found = default.kvstore.cache.get_many(list(files))
+    srcsets = {}
+    for key, users in files.items():
+        post, (_, _, geometry, options) = users[0]
+        value = found.get(key)
+        if isinstance(value, (str, bytes)) and value:
+            thumbnail = deserialize_image_file(value)
+        else:
+            thumbnail = get_thumbnail(post.image, geometry, **options)
+        for post, (image_format, width, _, _) in users:
+            srcsets.setdefault(post, {}).setdefault(image_format, []).append(
+                f'{thumbnail.url} {width}w'
+            )
+            if image_format == 'JPEG' and width == max(picture[2]):
+                setattr(post, attr, {'src': thumbnail})
+    for post, formats in srcsets.items():
+        getattr(post, attr)['sources'] = [
+            {'type': FORMAT_TYPES[image_format], 'srcset': ', '.join(urls)}
+            for image_format, urls in formats.items()
+        ]
+
+
+def pending():
+    return Post.objects.filter(
+        thumbnails=Post.THUMBNAILS_PENDING
+    ).exclude(image='').order_by('pk')
+
+
+def process_pending(limit=BATCH_SIZE):
+    """Обрабатывает очередь постов, ждущих миниатюр; возвращает их число."""
+    posts = list(pending().only(
+        'pk', 'image', 'author_id', 'group_id', 'placeholder'
+    )[:limit])
+    for post in posts:
+        fields = {}
+        try:
+            created = generate(post.image)
+            if created and not post.placeholder:
+                # Картинку сохранили в обход формы или до появления
+                # заглушек.
+                with post.image.open('rb') as image:
+                    fields['placeholder'], fields['dominant_color'] = (
+                        placeholder(image)
+                    )
+        except Exception:
+            logger.exception('Миниатюры поста %s не созданы', post.pk)
+            created = False
+            fields = {}
+        state = Post.THUMBNAILS_READY if created else Post.THUMBNAILS_FAILED
+        # Картинку могли заменить, пока шли миниатюры: тогда пост уже
+        # снова в очереди со своим файлом.
+        changed = Post.objects.filter(
+            pk=post.pk,
+            image=post.image.name,
+            thumbnails=Post.THUMBNAILS_PENDING
+        ).update(thumbnails=state, updated=timezone.now(), **fields)
+        if changed:
+            generations.bump_post(post.pk, post.author_id, post.group_id)
+    return len(posts)
@@ -0,0 +1,134 @@
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Follow, Post, TimelineEntry, UserStats
+from .utils import CursorSource
+
+BATCH_SIZE = 500
+
+
+def is_pulled(author_id):
+    """Посты автора с числом подписчиков выше порога читаются при запросе."""
+    return UserStats.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.FEED_PULL_THRESHOLD
+    ).exists()
+
+
+def pulled_authors(user):
+    return Follow.objects.filter(
+        user=user,
+        author__stats__followers_count__gt=settings.FEED_PULL_THRESHOLD
+    ).values_list('author_id', flat=True)
+
+
+def push_post(post):
+    """Разносит новый пост по лентам подписчиков автора."""
+    if is_pulled(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in followers.iterator()
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def _fill(user_ids, posts):
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+            for user_id in user_ids
+            for pk, pub_date in posts
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def _recent_posts(author_id, since=None):
+    """Последние FEED_BACKFILL_LIMIT постов автора, начиная с since."""
+    posts = Post.objects.filter(author_id=author_id)
+    if since is not None:
+        posts = posts.filter(pub_date__gte=since)
+    return list(
+        posts.order_by('-pub_date', '-pk').values_list(
+            'pk', 'pub_date'
+        )[:settings.FEED_BACKFILL_LIMIT]
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту читателя последние посты автора."""
+    if is_pulled(author_id):
+        return
+    _fill([user_id], _recent_posts(author_id))
+
+
+def promote(author_id):
+    """Запоминает, когда автор перешагнул порог и перестал рассылаться."""
+    UserStats.objects.filter(
+        user_id=author_id,
+        followers_count=settings.FEED_PULL_THRESHOLD + 1,
+        pulled_since__isnull=True
+    ).update(pulled_since=timezone.now())
+
+
+def demote(author_id):
+    """Возвращает автора, опустившегося до порога, в режим рассылки.
+
+    Пока автор был популярным, его новые посты не раскладывались по
+    лентам, а читались при запросе. После отписки, сравнявшей число
+    подписчиков с порогом, в ленты оставшихся подписчиков дописываются
+    посты, вышедшие с момента promote(), — не больше
+    FEED_BACKFILL_LIMIT, так что повторные подписки и отписки у порога
+    обходятся дёшево.
+    """
+    stats = UserStats.objects.filter(
+        user_id=author_id,
+        followers_count=settings.FEED_PULL_THRESHOLD
+    ).values('pulled_since').first()
+    if stats is None:
+        return
+    posts = _recent_posts(author_id, stats['pulled_since'])
+    if posts:
+        followers = Follow.objects.filter(
+            author_id=author_id
+        ).values_list('user_id', flat=True)
+        _fill(list(followers), posts)
+    UserStats.objects.filter(user_id=author_id).update(pulled_since=None)
+
+
+def trim(user_id, author_id):
+    """Убирает из ленты читателя посты автора после отписки."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def feed_sources(user):
+    """Источники ленты подписок: своя лента плюс посты популярных авторов.
+
+    Одни и те же посты могут оказаться в обоих источниках, если автор
+    перешагнул порог уже после рассылки, — пагинатор их схлопывает.
+    """
+    sources = [
+        CursorSource(
+            user.timeline.select_related('post__author', 'post__group'),
+            keys=('pub_date', 'post_id'),
+            item_attr='post'
+        )
+    ]
+    authors = list(pulled_authors(user))
+    if authors:
+        sources.append(CursorSource(
+            Post.objects.filter(
+                author_id__in=authors
+            ).select_related('author', 'group')
+        ))
+    return sources
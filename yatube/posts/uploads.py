@@ -0,0 +1,114 @@
+import os
+from base64 import b64encode
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from PIL import Image, ImageFilter, ImageOps
+
+# Форматы, в которых картинка сохраняется как есть; остальные
+# перекодируются в JPEG.
+KEPT_FORMATS = {'JPEG', 'PNG', 'GIF', 'WEBP'}
+JPEG_QUALITY = 90
+# Сторона размытой заглушки картинки, пикселей.
+PLACEHOLDER_SIZE = 32
+
+
+class OversizedUpload(UploadedFile):
+    """Заглушка файла, отброшенного при приёме из-за размера."""
+
+    def __init__(self, name, content_type, size, charset):
+        super().__init__(BytesIO(), name, content_type, size, charset)
+
+
+class SizeLimitUploadHandler(FileUploadHandler):
+    """Обрывает приём файла, как только он превысил IMAGE_MAX_UPLOAD_SIZE.
+
+    Остаток такого файла не доходит до следующих обработчиков и не
+    попадает ни в память, ни на диск; в FILES вместо него оказывается
+    OversizedUpload с числом принятых байт.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.oversized = False
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.IMAGE_MAX_UPLOAD_SIZE:
+            self.oversized = True
+        if self.oversized:
+            return None
+        return raw_data
+
+    def file_complete(self, file_size):
+        if not self.oversized:
+            return None
+        return OversizedUpload(
+            self.file_name, self.content_type, self.received, self.charset
+        )
+
+
+def ingest(upload):
+    """Готовит загруженную картинку к хранению.
+
+    JPEG декодируется сразу в уменьшенном масштабе (draft), картинка
+    поворачивается по EXIF Orientation, уменьшается до IMAGE_MAX_SIDE
+    по большей стороне (сначала быстрым ``reduce`` в целое число раз)
+    и сохраняется заново без EXIF. Анимированные картинки не трогаются.
+    """
+    max_side = settings.IMAGE_MAX_SIDE
+    upload.seek(0)
+    image = Image.open(upload)
+    if getattr(image, 'is_animated', False):
+        upload.seek(0)
+        return upload
+    image_format = image.format
+    icc_profile = image.info.get('icc_profile')
+    image.draft(image.mode, (max_side, max_side))
+    image = ImageOps.exif_transpose(image)
+    factor = max(image.size) // max_side
+    if factor > 1:
+        image = image.reduce(factor)
+    if max(image.size) > max_side:
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+    name = upload.name
+    params = {}
+    if image_format not in KEPT_FORMATS:
+        image_format = 'JPEG'
+        name = os.path.splitext(name)[0] + '.jpg'
+    if image_format == 'JPEG':
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        params = {'quality': JPEG_QUALITY, 'optimize': True}
+    if icc_profile:
+        params['icc_profile'] = icc_profile
+    output = BytesIO()
+    image.save(output, format=image_format, **params)
+    return ContentFile(output.getvalue(), name=name)
+
+
+def placeholder(file):
+    """Размытая крошечная копия картинки (data URI) и её основной цвет.
+
+    Обе строки встраиваются в страницу и видны, пока грузится миниатюра.
+    """
+    file.seek(0)
+    with Image.open(file) as image:
+        image.draft('RGB', (PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+        image = ImageOps.exif_transpose(image).convert('RGB')
+    file.seek(0)
+    image.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), Image.BOX)
+    palette = image.quantize(colors=8)
+    _, index = max(palette.getcolors())
+    red, green, blue = palette.getpalette()[index * 3:index * 3 + 3]
+    output = BytesIO()
+    image.filter(ImageFilter.GaussianBlur(1)).save(
+        output, 'JPEG', quality=40
+    )
+    data = b64encode(output.getvalue()).decode()
+    color = f'#{red:02x}{green:02x}{blue:02x}'
+    return f'data:image/jpeg;base64,{data}', color
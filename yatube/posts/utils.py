@@ -1,7 +1,209 @@
+from datetime import datetime
+
 from django.conf import settings
 from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+
+def encode_cursor(value, pk):
+    """Непрозрачный токен позиции в ленте: ключ сортировки и id.
+
+    Дата записывается в ISO 8601, прочие ключи (например, вещественная
+    оценка релевантности) — через repr, который читается обратно без
+    потери точности.
+    """
+    value = value.isoformat() if isinstance(value, datetime) else repr(value)
+    return urlsafe_base64_encode(force_bytes(f'{value}|{pk}'))
+
+
+def decode_cursor(token, parse=parse_datetime):
+    """Обратное преобразование токена; None для битого значения.
+
+    ``parse`` превращает строку ключа обратно в значение: по умолчанию
+    это дата, для оценки релевантности — ``float``.
+    """
+    try:
+        value, pk = urlsafe_base64_decode(token).decode().split('|')
+        value = parse(value)
+        pk = int(pk)
+    except (ValueError, TypeError, UnicodeDecodeError):
+        return None
+    if value is None:
+        return None
+    return value, pk
+
+
+class CursorSource:
+    """Источник строк курсорной ленты.
+
+    ``keys`` — поля сортировки (дата, id поста) в queryset, ``item_attr`` —
+    атрибут строки, в котором лежит сам пост (например, у записей ленты).
+    """
+
+    def __init__(self, queryset, keys=('pub_date', 'pk'), item_attr=None):
+        date_key, pk_key = keys
+        self.queryset = queryset.order_by(f'-{date_key}', f'-{pk_key}')
+        self.keys = keys
+        self.item_attr = item_attr
+
+    def items(self, rows):
+        if self.item_attr is None:
+            return list(rows)
+        return [getattr(row, self.item_attr) for row in rows]
+
+    def rows(self, after=None, before=None):
+        """Строки после/до ключа (pub_date, id) в порядке обхода."""
+        date_key, pk_key = self.keys
+        rows = self.queryset
+        # Условие на одну дату (lte/gte) — граница диапазона для индекса;
+        # без него OR не даёт SQLite начать чтение индекса с курсора.
+        if after is not None:
+            pub_date, pk = after
+            rows = rows.filter(
+                Q(**{f'{date_key}__lte': pub_date}),
+                Q(**{f'{date_key}__lt': pub_date})
+                | Q(**{f'{pk_key}__lt': pk})
+            )
+        elif before is not None:
+            pub_date, pk = before
+            rows = rows.filter(
+                Q(**{f'{date_key}__gte': pub_date}),
+                Q(**{f'{date_key}__gt': pub_date})
+                | Q(**{f'{pk_key}__gt': pk})
+            ).reverse()
+        return rows
+
+    def fetch(self, after=None, before=None, limit=None):
+        """Посты после/до ключа (pub_date, id) в порядке обхода."""
+        return self.items(self.rows(after, before)[:limit])
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу (pub_date, id) без COUNT(*) и OFFSET.
+
+    Номерные страницы (``page``) по-прежнему работают через родительский
+    Paginator, курсорные строятся запросом на per_page + 1 строку к
+    каждому источнику из ``sources`` (по умолчанию — к самому object_list)
+    со слиянием результатов.
+    """
+    ELLIPSIS = '…'
+
+    def __init__(self, object_list, per_page, sources=None, **kwargs):
+        super().__init__(
+            object_list.order_by('-pub_date', '-pk'), per_page, **kwargs
+        )
+        self.sources = sources or [CursorSource(object_list)]
+        self.cursor_mode = False
+        self.cursor = None
+
+    def get_elided_page_range(self, number=1, on_each_side=3, on_ends=2):
+        """Номера страниц вокруг текущей и по краям, пропуски — ELLIPSIS.
+
+        Бэкпорт Paginator.get_elided_page_range из Django 3.2.
+        """
+        number = self.validate_number(number)
+        if self.num_pages <= (on_each_side + on_ends) * 2:
+            yield from self.page_range
+            return
+        if number > (1 + on_each_side + on_ends) + 1:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < (self.num_pages - on_each_side - on_ends) - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(
+                self.num_pages - on_ends + 1, self.num_pages + 1
+            )
+        else:
+            yield from range(number + 1, self.num_pages + 1)
+
+    def _fetch(self, after, before, limit):
+        if len(self.sources) == 1:
+            return self.sources[0].fetch(after, before, limit)
+        merged = {}
+        for source in self.sources:
+            for post in source.fetch(after, before, limit):
+                merged.setdefault(post.pk, post)
+        return sorted(
+            merged.values(),
+            key=lambda post: (post.pub_date, post.pk),
+            reverse=before is None
+        )[:limit]
+
+    def get_cursor_page(self, after=None, before=None):
+        self.cursor_mode = True
+        self.cursor = ''
+        after_key = before_key = None
+        if after is not None:
+            after_key = decode_cursor(after)
+            if after_key is not None:
+                self.cursor = f'after:{after}'
+        elif before is not None:
+            before_key = decode_cursor(before)
+            if before_key is not None:
+                self.cursor = f'before:{before}'
+        posts = self._fetch(after_key, before_key, self.per_page + 1)
+        has_more = len(posts) > self.per_page
+        posts = posts[:self.per_page]
+        if before_key is not None:
+            posts.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, after_key is not None
+        if not posts:
+            has_next = has_previous = False
+        number = 2 if has_previous else 1
+        # Page сравнивает number с num_pages, поэтому вместо COUNT(*)
+        # num_pages выставляется по факту наличия соседних страниц.
+        self.num_pages = number + int(has_next)
+        page = self._get_page(posts, number, self)
+        page.next_cursor = (
+            encode_cursor(posts[-1].pub_date, posts[-1].pk)
+            if has_next else None
+        )
+        page.previous_cursor = (
+            encode_cursor(posts[0].pub_date, posts[0].pk)
+            if has_previous else None
+        )
+        return page
+
+
+def comments_page(comments, after=None, per_page=settings.SORT10):
+    """Комментарии по порядку публикации после курсора (created, id).
+
+    Возвращает не больше per_page комментариев и курсор следующей
+    порции (None, если комментариев больше нет).
+    """
+    comments = comments.order_by('created', 'pk')
+    key = decode_cursor(after) if after else None
+    if key is not None:
+        created, pk = key
+        comments = comments.filter(
+            Q(created__gte=created), Q(created__gt=created) | Q(pk__gt=pk)
+        )
+    comments = list(comments[:per_page + 1])
+    next_cursor = None
+    if len(comments) > per_page:
+        comments = comments[:per_page]
+        next_cursor = encode_cursor(comments[-1].created, comments[-1].pk)
+    return comments, next_cursor
 
 
-def pagination(request, posts):
-    paginator = Paginator(posts, settings.SORT10)
-    return paginator.get_page(request.GET.get('page'))
+def pagination(request, posts, **kwargs):
+    paginator = CursorPaginator(posts, settings.SORT10, **kwargs)
+    if 'page' in request.GET:
+        page = paginator.get_page(request.GET.get('page'))
+        page.elided_page_range = list(
+            paginator.get_elided_page_range(page.number)
+        )
+        return page
+    return paginator.get_cursor_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
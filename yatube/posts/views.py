@@ -1,33 +1,54 @@
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, render, redirect
+from django.views.decorators.http import condition
 
+from . import generations, lookups, stats, thumbnails, timeline
+from .autocomplete import index as autocomplete_index
 from .forms import PostForm, CommentForm
-from .models import Group, Post, User, Follow
-from .utils import pagination
+from .models import Post, Follow
+from .page_cache import (
+    cache_anonymous_page, group_etag, index_etag, post_etag, profile_etag,
+    tag_page
+)
+from .search import search_posts
+from .utils import comments_page, pagination
 
 
+@condition(etag_func=index_etag)
+@cache_anonymous_page
 def index(request):
+    tag_page(request, 'index')
     posts = Post.objects.select_related('group', 'author').all()
     page_obj = pagination(request, posts)
     context = {
         'page_obj': page_obj,
+        'feed_version': generations.get('index'),
     }
     return render(request, 'posts/index.html', context)
 
 
+@condition(etag_func=group_etag)
+@cache_anonymous_page
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
+    group = lookups.get_group_or_404(request, slug)
+    tag_page(request, f'group:{group.pk}')
     posts = group.posts.select_related('author').all()
     page_obj = pagination(request, posts)
     context = {
         'group': group,
         'page_obj': page_obj,
+        'feed_version': generations.get(f'group:{group.pk}'),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@condition(etag_func=profile_etag)
+@cache_anonymous_page
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    author = lookups.get_user_or_404(request, username)
+    tag_page(request, f'author:{author.pk}')
     posts = author.posts.select_related('group').all()
     page_obj = pagination(request, posts)
     following = (
@@ -39,15 +60,44 @@ def profile(request, username):
     context = {
         'page_obj': page_obj,
         'author': author,
-        'following': following
+        'author_stats': stats.get_stats(author),
+        'following': following,
+        'feed_version': generations.get(f'author:{author.pk}'),
     }
     return render(request, 'posts/profile.html', context)
 
 
+def autocomplete(request):
+    results = autocomplete_index.complete(request.GET.get('q', ''))
+    return JsonResponse({'results': results})
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    posts, next_cursor = search_posts(query, after=request.GET.get('after'))
+    context = {
+        'query': query,
+        'posts': posts,
+        'next_cursor': next_cursor,
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@condition(etag_func=post_etag)
+@cache_anonymous_page
 def post_detail(request, post_id):
+    tag_page(request, f'post:{post_id}')
     post = get_object_or_404(
-        Post.objects.select_related('author').prefetch_related(
-            'comments__author'), id=post_id
+        Post.objects.select_related('author__stats'), id=post_id
+    )
+    tag_page(request, f'author:{post.author_id}')
+    if post.group_id is not None:
+        tag_page(request, f'group:{post.group_id}')
+    thumbnails.attach(
+        [post], thumbnails.DETAIL_PICTURE, attr='detail_picture'
+    )
+    comments, comments_cursor = comments_page(
+        post.comments.select_related('author')
     )
     form = CommentForm(
         request.POST or None,
@@ -55,19 +105,41 @@ def post_detail(request, post_id):
     )
     context = {
         'post': post,
+        'author_stats': stats.get_stats(post.author),
         'form': form,
-        'comments': post.comments.all()
+        'comments': comments,
+        'comments_cursor': comments_cursor,
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_comments(request, post_id):
+    post = get_object_or_404(Post.objects.only('pk'), id=post_id)
+    comments, comments_cursor = comments_page(
+        post.comments.select_related('author'),
+        after=request.GET.get('after')
+    )
+    context = {
+        'post': post,
+        'comments': comments,
+        'comments_cursor': comments_cursor,
+    }
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
         new_post = form.save(commit=False)
         new_post.author = request.user
-        new_post.save()
+        # Файл пишется до транзакции вместе со своей строкой ImageBlob:
+        # если транзакция откатится, сборщик всё равно его найдёт.
+        image = new_post.image
+        if image and not image._committed:
+            image.save(image.name, image.file, save=False)
+        with transaction.atomic():
+            new_post.save()
         return redirect('posts:profile', username=request.user)
     context = {
         'form': form
@@ -80,6 +152,7 @@ def post_edit(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     if request.user != post.author:
         return redirect('posts:post_detail', post_id=post_id)
+    old_group_id = post.group_id
     form = PostForm(
         request.POST or None,
         files=request.FILES or None,
@@ -87,6 +160,8 @@ def post_edit(request, post_id):
     )
     if form.is_valid():
         form.save()
+        if old_group_id != post.group_id:
+            generations.bump_post(post.pk, post.author_id, old_group_id)
         return redirect('posts:post_detail', post_id=post_id)
     context = {
         'form': form,
@@ -112,8 +187,10 @@ def add_comment(request, post_id):
 def follow_index(request):
     posts = Post.objects.filter(
         author__following__user=request.user
-    ).select_related('author')
-    page_obj = pagination(request, posts)
+    ).select_related('author', 'group')
+    page_obj = pagination(
+        request, posts, sources=timeline.feed_sources(request.user)
+    )
     context = {
         'page_obj': page_obj
     }
@@ -122,7 +199,7 @@ def follow_index(request):
 
 @login_required
 def profile_follow(request, username):
-    author = get_object_or_404(User, username=username)
+    author = lookups.get_user_or_404(request, username)
     if request.user != author:
         Follow.objects.get_or_create(user=request.user, author=author)
     return redirect('posts:profile', username=username)
@@ -130,5 +207,7 @@ def profile_follow(request, username):
 
 @login_required
 def profile_unfollow(request, username):
-    Follow.objects.filter(author__username=username).delete()
+    author = lookups.find_user(request, username)
+    if author is not None:
+        Follow.objects.filter(user=request.user, author=author).delete()
     return redirect('posts:profile', username=username)
@@ -0,0 +1,27 @@
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+USER_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def user_key(user_id):
+    return f'users:session_user:{user_id}'
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend, берущий пользователя сессии из общего кэша.
+
+    Запись удаляется при любом сохранении пользователя (в том числе при
+    смене пароля) и при выходе из аккаунта, см. users.signals.
+    """
+
+    def get_user(self, user_id):
+        key = user_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, USER_CACHE_TIMEOUT)
+        elif not self.user_can_authenticate(user):
+            return None
+        return user
@@ -0,0 +1,40 @@
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY
+from django.core.cache import caches
+from django.db import migrations
+
+OLD_BACKEND = 'django.contrib.auth.backends.ModelBackend'
+NEW_BACKEND = 'users.backends.CachedModelBackend'
+
+
+def rewrite_backends(apps, schema_editor):
+    # Django разлогинивает сессию, бэкенда которой нет в
+    # AUTHENTICATION_BACKENDS: выданные раньше сессии переписываются
+    # на CachedModelBackend, а их копии в кэше сбрасываются.
+    Session = apps.get_model('sessions', 'Session')
+    SessionStore = import_module(settings.SESSION_ENGINE).SessionStore
+    store = SessionStore()
+    cache = caches[settings.SESSION_CACHE_ALIAS]
+    cache_prefix = getattr(SessionStore, 'cache_key_prefix', None)
+    for session in Session.objects.iterator():
+        data = store.decode(session.session_data)
+        if data.get(BACKEND_SESSION_KEY) != OLD_BACKEND:
+            continue
+        data[BACKEND_SESSION_KEY] = NEW_BACKEND
+        session.session_data = store.encode(data)
+        session.save(update_fields=['session_data'])
+        if cache_prefix is not None:
+            cache.delete(cache_prefix + session.session_key)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sessions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(rewrite_backends, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+User = get_user_model()
+
+
+class CachedSessionTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='reader', password='old-password-123'
+        )
+        self.client = Client()
+        self.client.login(username='reader', password='old-password-123')
+
+    def test_no_session_queries(self):
+        """Сессия и пользователь берутся из кэша, а не из базы."""
+        url = reverse('posts:follow_index')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.context['user'], self.user)
+        tables = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertNotIn('"django_session"', tables)
+        self.assertNotIn('FROM "auth_user"', tables)
+
+    def test_password_change_logs_out(self):
+        """После смены пароля закэшированная сессия недействительна."""
+        url = reverse('posts:follow_index')
+        self.client.get(url)
+        self.user.set_password('new-password-456')
+        self.user.save()
+        response = self.client.get(url)
+        self.assertRedirects(
+            response, reverse('users:login') + '?next=' + url
+        )
+
+    def test_logout_forgets_user(self):
+        """После выхода страница снова требует входа."""
+        url = reverse('posts:follow_index')
+        self.client.get(url)
+        self.client.get(reverse('users:logout'))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 302)
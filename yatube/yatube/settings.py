@@ -30,6 +30,15 @@ INSTALLED_APPS = [
     'sorl.thumbnail'
 ]
 
+# Сессии читаются из общего кэша, в базу только пишутся.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Сессии, выданные до появления CachedModelBackend, переводит на него
+# миграция users.0001_session_backend.
+AUTHENTICATION_BACKENDS = [
+    'users.backends.CachedModelBackend',
+]
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -106,6 +115,16 @@ SORT13 = 13
 
 ZERO = 0
 
+# Посты авторов с большим числом подписчиков не рассылаются по лентам,
+# а подмешиваются в ленту подписок при чтении.
+FEED_PULL_THRESHOLD = 1000
+# Сколько последних постов автора дописывается в ленту при подписке и
+# при возврате автора к рассылке.
+FEED_BACKFILL_LIMIT = 100
+
+# Время жизни полного кэша страниц для анонимных посетителей.
+PAGE_CACHE_TIMEOUT = 60 * 60
+
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 
@@ -116,8 +135,41 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Загрузки больше IMAGE_MAX_UPLOAD_SIZE байт отбрасываются ещё при
+# приёме, картинки крупнее IMAGE_MAX_SIDE по большей стороне уменьшаются.
+IMAGE_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+IMAGE_MAX_SIDE = 2560
+
+# Размеры (ширина, высота), в которых /media/r/<w>x<h>/<path> отдаёт
+# картинки, и время их жизни в кэше браузера: имена файлов картинок
+# постов зависят от содержимого, поэтому их копии не меняются; прочие
+# файлы могут быть перезаписаны и кэшируются недолго.
+RESIZE_SIZES = {
+    (480, 111), (768, 178), (1295, 300),
+    (480, 170), (960, 339),
+}
+RESIZE_CACHE_MAX_AGE = 60 * 60 * 24 * 365
+RESIZE_MUTABLE_MAX_AGE = 60 * 60
+
+FILE_UPLOAD_HANDLERS = [
+    'posts.uploads.SizeLimitUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    'template_fragments': {
+        'BACKEND': 'core.cache.StampedeCache',
+        'LOCATION': 'default',
+    },
 }
+
+# Тесты очищают кэш целиком: раннер переводит его во временный файл.
+TEST_RUNNER = 'core.testing.TestRunner'
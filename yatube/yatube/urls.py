@@ -3,9 +3,17 @@ from django.contrib import admin
 from django.urls import include, path
 from django.conf.urls.static import static
 
+from core.views import resized_image
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path(
+        settings.MEDIA_URL.lstrip('/')
+        + 'r/<int:width>x<int:height>/<path:name>',
+        resized_image,
+        name='resized_image'
+    ),
     path('', include('posts.urls', namespace='posts')),
     path('auth/', include('django.contrib.auth.urls')),
     path('auth/', include('users.urls', namespace='users')),